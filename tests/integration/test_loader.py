@@ -6,6 +6,7 @@ import os
 
 # Test Subject Modules
 from work_dir import loader as l
+from work_dir import filters as f
 
 class TestLoaderMethods(unittest.TestCase):
     def __init__(self, *args):
@@ -109,4 +110,39 @@ class TestLoaderMethods(unittest.TestCase):
             "Expected number of all lidar_cartesian to be the same as sum of numbers " +
             "of lidar_cartesian in all sweeps")
         self.assertEqual(self.sweep_dict[0].lidar_cartesian[5], all_lidar_cartesian[5],
-            "Expected values in all lidar cartesian to match values in all sweeps")
\ No newline at end of file
+            "Expected values in all lidar cartesian to match values in all sweeps")
+    
+    def test_SweepDict_filters(self):
+        flight_path = os.path.join("tests", "integration", "test_data", "FlightPath.csv")
+        lidar_path = os.path.join("tests", "integration", "test_data", "LIDARPoints.csv")
+        sweep_dict = l.SweepDict(lidar_path, flight_path, self.last_id, filters=[f.RangeFilter()])
+        all_lidar_polar = sweep_dict.get_all_lidar_polar()
+        unfiltered = sweep_dict.get_all_lidar_polar(masked=False)
+
+        self.assertTrue((all_lidar_polar[:, 1] > 0).all(),
+            "Expected zero distance returns to be filtered out.")
+        self.assertEqual(len(unfiltered) - len(all_lidar_polar), sweep_dict.filter_stats[0]["removed"],
+            "Expected the filter stats to count the removed points.")
+        self.assertEqual(len(sweep_dict.get_all_lidar_cartesian()), len(all_lidar_polar),
+            "Expected cartesian points to be filtered the same way.")
+        self.assertEqual(unfiltered, self.sweep_dict.get_all_lidar_polar(),
+            "Expected unfiltered points to stay available.")
+
+    def test_SweepDict_deskew(self):
+        flight_path = os.path.join("tests", "integration", "test_data", "FlightPath.csv")
+        lidar_path = os.path.join("tests", "integration", "test_data", "LIDARPoints.csv")
+        sweep_dict = l.SweepDict(lidar_path, flight_path, self.last_id, deskew=True)
+        first, last = self.keys[0], self.keys[-1]
+
+        self.assertEqual(sweep_dict[first].lidar_cartesian[0], self.sweep_dict[first].lidar_cartesian[0],
+            "Expected the first beam of a sweep to be taken at its drone position.")
+        self.assertFalse(np.allclose(sweep_dict[first].lidar_cartesian, self.sweep_dict[first].lidar_cartesian),
+            "Expected later beams to be projected from interpolated positions.")
+        self.assertEqual(sweep_dict[last].lidar_polar, self.sweep_dict[last].lidar_polar,
+            "Expected lidar_polar to stay unchanged.")
+        anchored = l.SweepDict(lidar_path, flight_path, self.last_id, deskew=True, deskew_anchor=0.5)
+        self.assertFalse(np.allclose(anchored[first].lidar_cartesian[0], self.sweep_dict[first].lidar_cartesian[0]),
+            "Expected deskew_anchor to move the beam taken at the drone position.")
+        static = l.SweepDict(lidar_path, flight_path, self.last_id, deskew=False)
+        self.assertTrue(np.allclose(static[first].lidar_cartesian, self.sweep_dict[first].lidar_cartesian),
+            "Expected no de-skew with deskew=False.")
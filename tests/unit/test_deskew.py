@@ -0,0 +1,42 @@
+# Regular Modules:
+import numpy as np
+import unittest
+
+# Test Subject Modules:
+from work_dir import deskew as d
+
+class TestDeskewMethods(unittest.TestCase):
+
+    def test_beam_times(self):
+        times = d.beam_times([3, 5], [2, 4], anchor=0.5)
+
+        self.assertTrue(np.allclose(times, [2.5, 3.0, 4.5, 4.75, 5.0, 5.25]),
+            "Expected beams spread evenly over their sweep, shifted by anchor.")
+
+    def test_interpolate_positions(self):
+        positions = np.array([[0, 0], [1, 0], [1, 2]], dtype=float)
+        times = np.array([0.5, 1.0, 1.5, 2.5, -1.0])
+        interpolated = d.interpolate_positions(times, np.array([0.0, 1.0, 2.0]), positions)
+
+        self.assertTrue(np.allclose(interpolated, [[0.5, 0], [1, 0], [1, 1], [1, 3], [-1, 0]]),
+            "Expected linear interpolation inside the trajectory and extrapolation outside.")
+
+    def test_deskew_sweeps(self):
+        # A 10 x 6 m room flown through at 0.5 m per sweep.
+        walls = np.array([[0, 0, 10, 0], [10, 0, 10, 6], [10, 6, 0, 6], [0, 6, 0, 0]], dtype=float)
+        positions = np.stack([np.linspace(2, 8, 13), np.linspace(2, 4, 13)], axis=1)
+        sweep_dict = d._simulate_flight(walls, positions, beams=180)
+        static = np.concatenate([sweep.lidar_cartesian for sweep in list(sweep_dict.values())[:-1]])
+        lidar_polar = [sweep.lidar_polar.copy() for sweep in list(sweep_dict.values())[:-1]]
+        d.deskew_sweeps(sweep_dict)
+        deskewed = np.concatenate([sweep.lidar_cartesian for sweep in list(sweep_dict.values())[:-1]])
+
+        self.assertTrue(d.distance_to_walls(static, walls).max() > 0.1,
+            "Expected points converted from one position per sweep to miss the walls.")
+        self.assertTrue(d.distance_to_walls(deskewed, walls).max() < 1e-6,
+            "Expected de-skewed points to lie on the walls.")
+        self.assertTrue(np.allclose(deskewed[0], static[0]),
+            "Expected the first beam (taken at drone_position) not to move.")
+        self.assertTrue(all((sweep.lidar_polar == polar).all()
+                            for sweep, polar in zip(list(sweep_dict.values())[:-1], lidar_polar)),
+            "Expected lidar_polar to stay unchanged.")
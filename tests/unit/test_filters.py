@@ -0,0 +1,63 @@
+# Regular Modules:
+import numpy as np
+import unittest
+from collections import OrderedDict
+
+# Test Subject Modules:
+from work_dir import loader as l
+from work_dir import filters as f
+
+class TestFiltersMethods(unittest.TestCase):
+
+    def test_RangeFilter(self):
+        polar = np.array([[10, 0], [20, 500], [30, 9000], [40, 12000]], dtype=float)
+
+        self.assertEqual(f.RangeFilter()(polar, None).tolist(), [False, True, True, True],
+            "Expected zero distance returns to be removed by default.")
+        self.assertEqual(f.RangeFilter(1000, 10000)(polar, None).tolist(), [False, False, True, False],
+            "Expected only distances within the range to be kept.")
+
+    def test_AngleFilter(self):
+        polar = np.array([[5, 1], [90, 1], [180, 1], [355, 1]], dtype=float)
+
+        self.assertEqual(f.AngleFilter(0, 180)(polar, None).tolist(), [True, True, True, False],
+            "Expected angles within the sector to be kept.")
+        self.assertEqual(f.AngleFilter(350, 10)(polar, None).tolist(), [True, False, False, True],
+            "Expected the sector to wrap around 360 degrees.")
+
+    def test_outlier_filters(self):
+        # A densely sampled wall with two isolated points far from it.
+        wall = np.stack([np.linspace(0, 5, 500), np.zeros(500)], axis=1)
+        cartesian = np.concatenate([wall, [[2.5, 3.0], [-4.0, -4.0]]])
+        polar = np.ones((len(cartesian), 2))
+        statistical = f.StatisticalOutlierFilter(k=4, std_ratio=2.0)(polar, cartesian)
+        radius = f.RadiusOutlierFilter(radius=0.1, min_neighbours=3)(polar, cartesian)
+
+        self.assertEqual(statistical[-2:].tolist(), [False, False],
+            "Expected isolated points to be removed by the statistical filter.")
+        self.assertTrue(statistical[:-2].all(), "Expected points on the wall to be kept.")
+        self.assertEqual(radius[-2:].tolist(), [False, False],
+            "Expected isolated points to be removed by the radius filter.")
+        self.assertTrue(radius[:-2].all(), "Expected points on the wall to be kept.")
+
+    def test_apply_filters(self):
+        sweep_dict = OrderedDict()
+        for i in range(3):
+            sweep = l.Sweep()
+            sweep.drone_position = np.zeros(2)
+            sweep.lidar_polar = np.stack([np.arange(10.0), np.arange(10.0) * 100], axis=1)
+            sweep.lidar_cartesian = np.random.rand(10, 2)
+            sweep_dict[i] = sweep
+        sweep_dict[3] = l.Sweep() # Sweeps without data should be skipped.
+        stats = f.apply_filters(sweep_dict, [f.RangeFilter(), f.RangeFilter(max_range=500)])
+
+        self.assertEqual([stat["removed"] for stat in stats], [3, 12],
+            "Expected each filter to count the points it removed of those left.")
+        self.assertTrue(all(stat["points_per_second"] > 0 for stat in stats), "Expected throughput per filter.")
+        self.assertEqual(sweep_dict[1].mask.tolist(), [False] + [True] * 5 + [False] * 4,
+            "Expected each sweep to get its part of the flight mask.")
+        self.assertIsNone(sweep_dict[3].mask, "Expected sweeps without data to get no mask.")
+        self.assertEqual(sweep_dict[1].masked("lidar_cartesian").shape, (5, 2),
+            "Expected masked points to leave out filtered points.")
+        self.assertEqual(sweep_dict[1].lidar_cartesian.shape, (10, 2),
+            "Expected the points of the sweep to stay unchanged.")
@@ -0,0 +1,100 @@
+# Regular Modules:
+import numpy as np
+import unittest
+import tempfile
+import os
+
+# Test Subject Modules:
+from work_dir import loader as l
+from work_dir import flight_archive as fa
+
+class TestFlightArchiveMethods(unittest.TestCase):
+
+    def setUp(self):
+        # Three sweeps in the CSV layout, the last one without LIDAR points.
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.lidar_path = os.path.join(self.temp_dir.name, "LIDARPoints.csv")
+        self.flight_path = os.path.join(self.temp_dir.name, "FlightPath.csv")
+        self.archive_path = os.path.join(self.temp_dir.name, "Flight.lidarz")
+        rng = np.random.default_rng(0)
+        self.polar = [np.stack([np.sort(rng.random(50) * 360), rng.integers(0, 9000, 50)], axis=1),
+                      np.stack([rng.random(80) * 360, rng.integers(0, 9000, 80)], axis=1)]
+        self.positions = [[12.87234, 3.62299], [13.91074, 4.694889], [9.866528468608772, 8.124254110437295]]
+        fa._write_rows(self.lidar_path, enumerate(self.polar))
+        fa._write_rows(self.flight_path, [(i, [position]) for i, position in enumerate(self.positions)],
+                       lambda value: repr(float(value)))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_encode_decode(self):
+        polar = self.polar + [np.empty((0, 2))]
+        chunks = fa.encode_sweeps(polar, angle_step=1e-6, distance_step=1.0)
+
+        self.assertEqual(len(chunks), 3, "Expected one chunk per sweep.")
+        for sweep, chunk in zip(polar, chunks):
+            decoded = fa.decode_sweep(chunk, len(sweep), 1e-6, 1.0)
+            self.assertEqual(decoded.shape, sweep.shape, "Expected decoded sweep to keep its shape.")
+            self.assertTrue(np.abs(decoded - sweep).max(initial=0) <= 5e-7 + 1e-9,
+                "Expected values to be off by at most half a quantization step.")
+        with self.assertRaises(ValueError):
+            fa.encode_sweeps([np.array([[359.5, 100], [0.5, 200]])], angle_step=1e-7)
+        with self.assertRaises(ValueError):
+            fa.encode_sweeps([np.array([[0.5, 3e9]])], distance_step=1.0)
+
+    def test_shuffle_little_endian(self):
+        data = fa._shuffle(np.array([0x01020304, 0x05060708], dtype=np.uint32))
+
+        self.assertEqual(data, bytes([4, 8, 3, 7, 2, 6, 1, 5]),
+            "Expected the lowest bytes first, stored little endian on any machine.")
+        self.assertEqual(fa._unshuffle(data, 2).tolist(), [0x01020304, 0x05060708],
+            "Expected unshuffle to restore the values.")
+
+    def test_csv_round_trip(self):
+        fa.csv_to_archive(self.lidar_path, self.flight_path, self.archive_path)
+        lidar_path = os.path.join(self.temp_dir.name, "LIDARPoints2.csv")
+        flight_path = os.path.join(self.temp_dir.name, "FlightPath2.csv")
+        fa.archive_to_csv(self.archive_path, lidar_path, flight_path)
+
+        self.assertTrue(fa.is_flight_archive(self.archive_path), "Expected archive to be recognized.")
+        self.assertFalse(fa.is_flight_archive(self.lidar_path), "Expected CSV not to be taken for an archive.")
+        self.assertLess(os.path.getsize(self.archive_path), os.path.getsize(self.lidar_path),
+            "Expected archive to be smaller than the CSV.")
+        with open(flight_path) as converted, open(self.flight_path) as original:
+            self.assertEqual(converted.read(), original.read(),
+                "Expected drone positions to be converted back unchanged.")
+        original = l.SweepDict(self.lidar_path, self.flight_path)
+        converted = l.SweepDict(lidar_path, flight_path)
+        for key in original:
+            self.assertTrue(np.allclose(original[key].drone_position, converted[key].drone_position),
+                "Expected the same drone positions after a round trip.")
+            if original[key].lidar_polar is not None:
+                self.assertTrue(np.allclose(original[key].lidar_polar, converted[key].lidar_polar, atol=1e-6),
+                    "Expected the same LIDAR points after a round trip.")
+
+    def test_SweepDict_from_archive(self):
+        fa.csv_to_archive(self.lidar_path, self.flight_path, self.archive_path)
+        from_csv = l.SweepDict(self.lidar_path, self.flight_path)
+        from_archive = l.SweepDict(self.archive_path, None)
+        limited = l.SweepDict(self.archive_path, None, last_id=0)
+
+        self.assertEqual(list(from_archive.keys()), list(from_csv.keys()),
+            "Expected the same sweeps from the archive as from the CSV files.")
+        self.assertIsNone(from_archive[2].lidar_polar, "Expected sweep without points to stay empty.")
+        self.assertTrue(np.allclose(from_archive.get_all_lidar_cartesian(), from_csv.get_all_lidar_cartesian()),
+            "Expected the same cartesian points from the archive as from the CSV files.")
+        self.assertEqual(list(limited.keys()), [0], "Expected last_id to limit the sweeps read.")
+
+    def test_FlightArchive_single_sweep(self):
+        fa.csv_to_archive(self.lidar_path, self.flight_path, self.archive_path)
+        archive = fa.FlightArchive(self.archive_path)
+
+        self.assertEqual(archive.sweep_ids, [0, 1, 2], "Expected every sweep in the index.")
+        self.assertEqual(archive.point_count, 130, "Expected point count of all sweeps.")
+        self.assertTrue(np.allclose(archive.read_lidar_polar(1), self.polar[1], atol=1e-6),
+            "Expected one sweep to be decoded on its own.")
+        self.assertTrue(np.allclose(archive.read_drone_position(2), self.positions[2]),
+            "Expected drone position from the index.")
+        self.assertIsNone(archive.read_lidar_polar(2), "Expected None for a sweep without points.")
+        with self.assertRaises(AssertionError):
+            fa.FlightArchive(self.lidar_path)
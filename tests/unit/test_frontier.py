@@ -0,0 +1,105 @@
+# Regular Modules:
+import numpy as np
+import unittest
+from scipy import ndimage
+
+# Test Subject Modules:
+from work_dir import loader as l
+from work_dir import frontier as fr
+
+def cluster_sets(clusters):
+    # Clusters (list of np.arrays (K, 2) of cells) as a set of frozensets, independent of order and labels.
+    return {frozenset(map(tuple, cells.tolist())) for cells in clusters}
+
+def simulate_sweep(position, walls, beams=720):
+    # Sweep from position against walls (N, 4), beams hitting nothing get distance 0.
+    angles = np.arange(beams) * 360 / beams
+    directions = np.stack([np.cos(np.radians(angles)), -np.sin(np.radians(angles))], axis=1)
+    starts, ends = walls[:, :2], walls[:, 2:]
+    distances = np.full(beams, np.inf)
+    for start, end in zip(starts, ends):
+        edge = end - start
+        denominator = directions[:, 0] * edge[1] - directions[:, 1] * edge[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            offset = start - position
+            t = (offset[0] * edge[1] - offset[1] * edge[0]) / denominator
+            u = (offset[0] * directions[:, 1] - offset[1] * directions[:, 0]) / denominator
+        hit = (t > 0) & (u >= 0) & (u <= 1)
+        distances[hit] = np.minimum(distances[hit], t[hit])
+    sweep = l.Sweep()
+    sweep.drone_position = np.array(position, dtype=float)
+    sweep.lidar_polar = np.stack([angles, np.where(np.isinf(distances), 0, np.round(distances * 1000))], axis=1)
+    return sweep
+
+class TestFrontierMethods(unittest.TestCase):
+
+    def setUp(self):
+        # Corridor from x=-1 to x=6 between y=-1 and y=1, open at both ends.
+        self.walls = np.array([[-1, -1, 6, -1], [-1, 1, 6, 1]], dtype=float)
+
+    def test_incremental_frontier(self):
+        frontier_map = fr.FrontierMap(resolution=0.1)
+        for x in (0.0, 2.0, 4.0):
+            frontier_map.add_sweep(simulate_sweep([x, 0.0], self.walls))
+            self.assertTrue((frontier_map.frontier == fr.full_frontier(frontier_map.state)).all(),
+                "Expected updating around each sweep to match recomputing the whole grid.")
+            labels, count = ndimage.label(frontier_map.frontier, structure=np.ones((3, 3), dtype=bool))
+            full_clusters = [np.argwhere(labels == label) for label in range(1, count + 1)]
+            self.assertEqual(cluster_sets(frontier_map.clusters()), cluster_sets(full_clusters),
+                "Expected clusters kept up to date per sweep to match labelling the whole frontier.")
+
+        self.assertEqual(frontier_map.state[tuple(frontier_map.to_cells([[3.0, 0.5]])[0])], fr.FREE,
+            "Expected cells inside the corridor to be free.")
+        self.assertEqual(frontier_map.state[tuple(frontier_map.to_cells([[3.0, -1.0]])[0])], fr.OCCUPIED,
+            "Expected cells on the walls to be occupied.")
+        self.assertEqual(frontier_map.state[tuple(frontier_map.to_cells([[3.0, 1.5]])[0])], fr.UNKNOWN,
+            "Expected cells behind the walls to stay unknown.")
+
+    def test_masked_beams(self):
+        frontier_map = fr.FrontierMap(resolution=0.1)
+        sweep = simulate_sweep([1.0, 0.0], self.walls)
+        # Filter out every beam pointing to the left.
+        sweep.mask = np.cos(np.radians(sweep.lidar_polar[:, 0])) > 0
+        frontier_map.add_sweep(sweep)
+
+        self.assertEqual(frontier_map.state[tuple(frontier_map.to_cells([[3.0, 0.5]])[0])], fr.FREE,
+            "Expected cells along kept beams to be free.")
+        self.assertEqual(frontier_map.state[tuple(frontier_map.to_cells([[0.5, 0.5]])[0])], fr.UNKNOWN,
+            "Expected cells only along filtered beams to stay unknown.")
+
+    def test_grow(self):
+        frontier_map = fr.FrontierMap(resolution=0.1, margin=0.5)
+        frontier_map.add_sweep(simulate_sweep([0.0, 0.0], self.walls))
+        shape, origin = frontier_map.state.shape, frontier_map.origin.copy()
+        walls = np.array([[-20, -21, 20, -21], [-20, -19, 20, -19]], dtype=float)
+        frontier_map.add_sweep(simulate_sweep([-10.0, -20.0], walls))
+
+        self.assertTrue(frontier_map.state.shape[0] > shape[0] and (frontier_map.origin < origin).all(),
+            "Expected the grid to grow to fit the new sweep.")
+        self.assertEqual(frontier_map.state[tuple(frontier_map.to_cells([[0.5, 0.0]])[0])], fr.FREE,
+            "Expected earlier cells to keep their state when the grid grows.")
+        self.assertTrue((frontier_map.frontier == fr.full_frontier(frontier_map.state)).all(),
+            "Expected frontier to stay correct when the grid grows.")
+        labels, count = ndimage.label(frontier_map.frontier, structure=np.ones((3, 3), dtype=bool))
+        self.assertEqual(cluster_sets(frontier_map.clusters()),
+                         cluster_sets([np.argwhere(labels == label) for label in range(1, count + 1)]),
+            "Expected clusters to move along when the grid grows.")
+
+    def test_rank_frontiers(self):
+        frontier_map = fr.FrontierMap(resolution=0.1)
+        frontier_map.add_sweep(simulate_sweep([1.0, 0.0], self.walls))
+        ranked = frontier_map.rank_frontiers([1.0, 0.0])
+
+        self.assertEqual(len(ranked), 2, "Expected one frontier at each open end of the corridor.")
+        self.assertTrue(ranked[0]["goal"][0] < 1.0 < ranked[1]["goal"][0],
+            "Expected the frontier at the near (left) end first.")
+        self.assertTrue(ranked[0]["cost"] < ranked[1]["cost"], "Expected frontiers sorted by cost.")
+        for frontier in ranked:
+            straight = np.linalg.norm(frontier["goal"] - [1.0, 0.0])
+            self.assertTrue(straight - 0.2 <= frontier["cost"] <= straight * 1.1 + 0.2,
+                "Expected path cost close to the straight distance in an open corridor.")
+        nearest = frontier_map.rank_frontiers([1.0, 0.0], count=1)
+        self.assertEqual(len(nearest), 1, "Expected only the requested number of frontiers.")
+        self.assertTrue(np.allclose(nearest[0]["goal"], ranked[0]["goal"]) and
+                        np.isclose(nearest[0]["cost"], ranked[0]["cost"]),
+            "Expected the bounded search to find the same cheapest frontier as the full search.")
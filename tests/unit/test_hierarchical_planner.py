@@ -0,0 +1,66 @@
+# Regular Modules:
+import numpy as np
+import unittest
+
+# Test Subject Modules:
+from work_dir import hierarchical_planner as hp
+from work_dir import wall_index as wi
+
+class TestHierarchicalPlannerMethods(unittest.TestCase):
+
+    def test_get_waypoints(self):
+        single = hp.get_waypoints(np.array([[0, 0, 1, 0]]), clearance=0.1)
+        corner = hp.get_waypoints(np.array([[0, 0, 1, 0], [0, 0, 0, 1]]), clearance=0.1)
+        straight = hp.get_waypoints(np.array([[0, 0, 1, 0], [1, 0, 2, 0]]), clearance=0.1)
+
+        self.assertTrue(np.allclose(sorted(single.tolist()), [[-0.1, 0], [1.1, 0]]),
+            "Expected one waypoint beyond each end of a lone wall.")
+        self.assertEqual(len(corner), 3,
+            "Expected one waypoint at each free end and one outside the corner.")
+        self.assertTrue(any(np.allclose(point, -0.1 / np.sqrt(2)) for point in corner),
+            "Expected the corner waypoint on the bisector of the outside angle.")
+        self.assertEqual(len(straight), 2,
+            "Expected no waypoint where two walls continue in a straight line.")
+
+    def test_planners(self):
+        walls, extent = hp._room_grid(4)
+        flat = hp.FlatPlanner(walls)
+        hierarchical = hp.HierarchicalPlanner(walls, tile_size=6.0)
+        wall_index = wi.WallIndex(walls)
+        rng = np.random.default_rng(2)
+        for start, end in rng.random((10, 2, 2)) * (extent - 1) + 0.5:
+            flat_path = flat.shortest_path(start, end)
+            path = hierarchical.shortest_path(start, end)
+
+            self.assertTrue(np.allclose(path[[0, -1]], [start, end]),
+                "Expected path to go from start to end.")
+            self.assertIsNone(wi.validate_path(path, wall_index, touching=True),
+                "Expected path not to cross or touch any wall.")
+            self.assertIsNone(wi.validate_path(flat_path, wall_index, touching=True),
+                "Expected flat path not to cross or touch any wall.")
+            self.assertLessEqual(hp.path_length(path), hp.path_length(flat_path) * 1.1,
+                "Expected hierarchical path to be close to the flat shortest path.")
+
+    def test_unreachable(self):
+        box = np.array([[0, 0, 2, 0], [2, 0, 2, 2], [2, 2, 0, 2], [0, 2, 0, 0]], dtype=float)
+        walls = np.concatenate([box, box + [10, 0, 10, 0]])
+        hierarchical = hp.HierarchicalPlanner(walls, tile_size=3.0)
+
+        self.assertIsNone(hierarchical.shortest_path([1, 1], [11, 1]),
+            "Expected None when end is inside a closed box.")
+        self.assertIsNone(hp.FlatPlanner(walls).shortest_path([1, 1], [11, 1]),
+            "Expected None when end is inside a closed box.")
+        self.assertEqual(len(hierarchical.shortest_path([1, 1], [1.5, 1.5])), 2,
+            "Expected a straight path between points that see each other.")
+
+    def test_narrow_passage_across_border(self):
+        # A 1 m corridor crossing the border between two 10 m tiles away from the fixed portal spacing.
+        walls = np.array([[0, 1.4, 20, 1.4], [0, 2.4, 20, 2.4]], dtype=float)
+        hierarchical = hp.HierarchicalPlanner(walls, tile_size=10.0)
+        path = hierarchical.shortest_path([2, 1.9], [18, 1.9])
+
+        self.assertIsNotNone(path, "Expected a portal in the free part of the border inside the corridor.")
+        self.assertAlmostEqual(hp.path_length(path), 16.0,
+            msg="Expected the straight path along the corridor, as the flat planner finds.")
+        self.assertIsNone(wi.validate_path(path, wi.WallIndex(walls), touching=True),
+            "Expected path not to cross or touch any wall.")
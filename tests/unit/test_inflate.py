@@ -0,0 +1,98 @@
+# Regular Modules:
+import numpy as np
+import unittest
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import os
+
+# Test Subject Modules:
+from work_dir import inflate as inf
+from work_dir import deskew as d
+
+class TestInflateMethods(unittest.TestCase):
+
+    def setUp(self):
+        # A 10x10 room split by a wall from the bottom up to y=8.
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.mapping_path = os.path.join(self.temp_dir.name, "Mapping.csv")
+        self.walls = np.array([[0, 0, 10, 0], [10, 0, 10, 10], [10, 10, 0, 10], [0, 10, 0, 0], [5, 0, 5, 8]],
+                              dtype=float)
+        with open(self.mapping_path, 'w', newline='') as csvfile:
+            csv.writer(csvfile).writerows(self.walls)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_DistanceField(self):
+        field = inf.DistanceField(self.walls, resolution=0.05, margin=1.0)
+        points = np.random.default_rng(0).random((200, 2)) * 10
+        true_distances = d.distance_to_walls(points, self.walls)
+
+        self.assertTrue(np.abs(field.at(points) - true_distances).max() <= field.error + 1e-6,
+            "Expected distances within the error of the field.")
+
+    def test_inflate_walls(self):
+        wall = np.array([[0, 0, 4, 0]], dtype=float)
+        outlines = inf.inflate_walls(wall, 0.5, resolution=0.05)
+        distances = d.distance_to_walls(outlines[0], wall)
+        close_walls = np.array([[0, 0, 4, 0], [0, 0.4, 4, 0.4]], dtype=float)
+
+        self.assertEqual(len(outlines), 1, "Expected one outline around a single wall.")
+        self.assertTrue(distances.min() >= 0.5, "Expected the outline to keep the radius from the wall.")
+        self.assertTrue(distances.max() <= 0.5 + 0.1, "Expected the outline to stay close to the radius.")
+        self.assertEqual(len(inf.inflate_walls(close_walls, 0.3, resolution=0.05)), 1,
+            "Expected overlapping inflated walls to be merged into one outline.")
+        self.assertEqual(len(inf.inflate_polygons([np.array([[0, 0], [4, 0], [4, 4], [0, 4]], dtype=float)],
+                                                  0.5)), 2,
+            "Expected an outline outside and one inside an inflated square.")
+
+    def test_read_mapping(self):
+        walls, digest = inf.read_mapping(self.mapping_path)
+
+        self.assertTrue((walls == self.walls).all(), "Expected the walls of the mapping file.")
+        with open(self.mapping_path, 'a', newline='') as csvfile:
+            csv.writer(csvfile).writerow([2, 2, 3, 3])
+        self.assertNotEqual(inf.read_mapping(self.mapping_path)[1], digest,
+            "Expected a changed mapping file to get a new digest.")
+
+    def test_InflationCache(self):
+        cache = inf.InflationCache(resolution=0.05)
+        small = cache.get(self.walls, 0.3)
+        large = cache.get(self.walls, 0.6)
+        again = cache.get(self.walls, 0.3)
+
+        self.assertIs(again, small, "Expected the cached map for a radius seen before.")
+        self.assertEqual((cache.hits, cache.misses), (1, 2), "Expected one miss per new radius.")
+        self.assertEqual(len(cache._fields), 1, "Expected one distance field shared by all radii.")
+        changed = np.concatenate([self.walls, [[2, 2, 3, 3]]])
+        self.assertIsNot(cache.get(changed, 0.3), small,
+            "Expected changed walls to be inflated again.")
+
+        path = large.shortest_path([2, 2], [8, 2])
+        samples = np.concatenate([np.linspace(a, b, 100) for a, b in zip(path[:-1], path[1:])])
+        self.assertTrue(d.distance_to_walls(samples, self.walls).min() >= 0.6,
+            "Expected the path to keep the radius from every wall.")
+        self.assertIsNone(large.shortest_path([2, 0.3], [8, 2]),
+            "Expected no path from a start the drone does not fit at.")
+
+    def test_InflationCache_eviction(self):
+        cache = inf.InflationCache(resolution=0.05, max_maps=2)
+        for offset in range(4):
+            cache.get(self.walls + offset, 0.3)
+
+        self.assertEqual(len(cache), 2, "Expected no more than max_maps maps.")
+        self.assertEqual(len(cache._fields), 2,
+            "Expected distance fields to be dropped with the last map using them.")
+
+    def test_InflationCache_threads(self):
+        cache = inf.InflationCache(resolution=0.05)
+        walls, digest = inf.read_mapping(self.mapping_path)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            maps = list(executor.map(lambda radius: cache.get(walls, radius, digest), [0.3] * 8))
+
+        self.assertTrue(all(inflated is maps[0] for inflated in maps),
+            "Expected threads asking for the same radius to get the same map.")
+        self.assertEqual((cache.hits, cache.misses), (7, 1), "Expected the map to be built only once.")
+        with self.assertRaises(ValueError):
+            cache.get(walls, 1.5, digest)
@@ -42,6 +42,21 @@ class TestLoaderMethods(unittest.TestCase):
         with self.assertRaises(AssertionError):
             sweep.lidar_cartesian = np.random.randint(0, 10, (10, 2))
     
+    def test_Sweep_mask(self):
+        sweep = l.Sweep()
+        sweep.lidar_polar = np.random.rand(4, 2)
+        sweep.lidar_cartesian = np.random.rand(4, 2)
+        sweep.mask = np.array([True, False, True, True])
+
+        self.assertEqual(len(sweep.masked("lidar_cartesian")), 3,
+            "Expected masked to leave out the filtered points.")
+        with self.assertRaises(AssertionError):
+            sweep.mask = np.ones(5, dtype=bool)
+        sweep.lidar_polar = np.random.rand(6, 2)
+        self.assertIsNone(sweep.mask, "Expected new lidar_polar points to clear the old mask.")
+        self.assertEqual(len(sweep.masked("lidar_polar")), 6,
+            "Expected every new point to be kept.")
+
     def test_to_np_array(self):
         data = [["0", "1", "2", "3", "4", "5"]]
         data2 = [["1.2", "3.6"], ["5.7", "4.5"]]
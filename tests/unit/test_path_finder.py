@@ -1,10 +1,14 @@
 # Regular Modules:
 import numpy as np
 import unittest
+import tempfile
+import csv
+import os
 from collections import defaultdict
 
 # Test Subject Modules:
 from work_dir import path_finder as pf
+from work_dir import simplify as sp
 
 class TestPathFinderMethods(unittest.TestCase):
     
@@ -139,4 +143,38 @@ class TestPathFinderMethods(unittest.TestCase):
         self.assertTrue(bound_max[0] > max_point[0] or bound_max[1] > max_point[1],
             "Expected bounding not to overlap with any points in all_points")
         self.assertTrue(bound_min[0] < min_point[0] or bound_min[1] < min_point[1],
-            "Expected bounding not to overlap with any points in all_points")
\ No newline at end of file
+            "Expected bounding not to overlap with any points in all_points")
+
+    def test_balance_dict(self):
+        # A square room with a dangling wall of three segments: 0 - 4 - 5 - 6.
+        wall_indices = np.array([[0, 1], [1, 2], [2, 3], [3, 0], [0, 4], [4, 5], [5, 6]])
+        wall_dict = pf.get_wall_dict(wall_indices)
+        ref_dict = pf.balance_dict(wall_dict)
+        fake_points = [point for point in wall_dict.keys() if point > 6]
+
+        self.assertTrue(all(len(walls) == 2 for walls in wall_dict.values()),
+            "Expected every point to have exactly two walls after balancing.")
+        self.assertCountEqual(fake_points, ref_dict.keys(),
+            "Expected every fake point to be linked to a real point.")
+        self.assertCountEqual(ref_dict.values(), [0, 4, 5],
+            "Expected fake points to run parallel to the dangling wall back to its start.")
+
+    def test_load_polygons_stats(self):
+        # A square room with every wall split into 4 collinear walls.
+        corners = np.array([[0, 0], [4, 0], [4, 4], [0, 4]], dtype=float)
+        walls = sp.densify_walls(np.concatenate([corners, np.roll(corners, -1, axis=0)], axis=1), 4)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            mapping_path = os.path.join(temp_dir, "Mapping.csv")
+            with open(mapping_path, 'w', newline='') as csvfile:
+                csv.writer(csvfile).writerows(walls)
+            stats, unsimplified_stats = dict(), dict()
+            polygons = pf.load_polygons(mapping_path, max_deviation=0.01, stats=stats)
+            pf.load_polygons(mapping_path, stats=unsimplified_stats)
+
+        # Of the 16 vertices, the 4 corners and the first vertex of the polygon (always kept) are left.
+        self.assertEqual(stats["vertices_removed"], 11,
+            "Expected the count of collinear vertices removed by simplification.")
+        self.assertEqual(unsimplified_stats["vertices_removed"], 0,
+            "Expected nothing removed without max_deviation.")
+        self.assertEqual(sum(map(len, polygons)), 16 - 11 + 5,
+            "Expected the kept vertices and the bounding box added by inside_out_polygon.")
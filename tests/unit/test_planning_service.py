@@ -0,0 +1,139 @@
+# Regular Modules:
+import numpy as np
+import unittest
+import tempfile
+import asyncio
+import json
+import csv
+import os
+
+# Test Subject Modules:
+from work_dir import planning_service as ps
+
+class TestPlanningServiceMethods(unittest.TestCase):
+
+    def setUp(self):
+        # A 10x10 room split by a wall from the bottom up to y=8.
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.mapping_path = os.path.join(self.temp_dir.name, "Mapping.csv")
+        walls = [[0, 0, 5, 0], [5, 0, 10, 0], [10, 0, 10, 10], [10, 10, 0, 10], [0, 10, 0, 0], [5, 0, 5, 8]]
+        with open(self.mapping_path, 'w', newline='') as csvfile:
+            csv.writer(csvfile).writerows(walls)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_handle_request(self):
+        async def run():
+            service = ps.PlanningService()
+            await service.load_map("room", self.mapping_path)
+            path = await service.handle_request({"op": "path", "map": "room", "start": [2, 2], "end": [8, 2]})
+            unknown = await service.handle_request({"op": "path", "map": "other", "start": [2, 2], "end": [8, 2]})
+            bad_op = await service.handle_request({"op": "fly"})
+            not_object = await service.handle_request([1, 2])
+            reload = await service.handle_request({"op": "load", "map": "room"})
+            maps = await service.handle_request({"op": "maps"})
+            return path, unknown, bad_op, not_object, reload, maps
+        path, unknown, bad_op, not_object, reload, maps = asyncio.run(run())
+
+        self.assertTrue(path["ok"], "Expected path request on a loaded map to succeed.")
+        self.assertEqual(path["path"][0], [2, 2], "Expected path to begin at start.")
+        self.assertEqual(path["path"][-1], [8, 2], "Expected path to end at end.")
+        self.assertTrue(max(point[1] for point in path["path"]) >= 8,
+            "Expected path to go around the dividing wall.")
+        self.assertAlmostEqual(path["length"], np.linalg.norm(np.diff(path["path"], axis=0), axis=1).sum(),
+            msg="Expected length to be the length of the returned path.")
+        self.assertFalse(unknown["ok"], "Expected request for an unknown map to fail.")
+        self.assertEqual(unknown["error"], "Unknown map 'other'", "Expected the error to name the unknown map.")
+        self.assertFalse(bad_op["ok"], "Expected request with an unknown op to fail.")
+        self.assertFalse(not_object["ok"], "Expected a request that is not a JSON object to fail.")
+        self.assertTrue(reload["ok"], "Expected reload from the last mapping path to succeed.")
+        self.assertEqual(maps["maps"], ["room"], "Expected maps to list the loaded map.")
+
+    def test_path_radius(self):
+        async def run():
+            service = ps.PlanningService()
+            await service.load_map("room", self.mapping_path)
+            request = {"op": "path", "map": "room", "start": [2, 2], "end": [8, 2]}
+            fits = await service.handle_request(dict(request, radius=0.5))
+            again = await service.handle_request(dict(request, radius=0.5))
+            too_wide = await service.handle_request(dict(request, radius=0.95))
+            too_large = await service.handle_request(dict(request, radius=1.5))
+            return fits, again, too_wide, too_large
+        fits, again, too_wide, too_large = asyncio.run(run())
+
+        self.assertTrue(fits["ok"], "Expected a path for a drone fitting through the gap.")
+        self.assertTrue(max(point[1] for point in fits["path"]) >= 8.5,
+            "Expected the path to keep the radius from the end of the dividing wall.")
+        self.assertEqual(again["path"], fits["path"], "Expected the same path from the cached map.")
+        self.assertFalse(too_wide["ok"], "Expected no path for a drone wider than the gap.")
+        self.assertTrue(too_wide["error"].startswith("No path"),
+            "Expected the error to be the missing path, not the radius limit.")
+        self.assertFalse(too_large["ok"], "Expected a radius beyond max_radius to be refused.")
+
+        async def run_larger():
+            service = ps.PlanningService(max_radius=2.0)
+            await service.load_map("room", self.mapping_path)
+            return await service.handle_request({"op": "path", "map": "room", "start": [2, 2], "end": [8, 2],
+                                                 "radius": 1.5})
+        larger = asyncio.run(run_larger())
+        self.assertTrue(larger["error"].startswith("No path"),
+            "Expected a service with a larger max_radius to plan for larger drones.")
+
+    def test_edited_mapping(self):
+        async def run():
+            service = ps.PlanningService()
+            await service.load_map("room", self.mapping_path)
+            # Close the gap on disk after loading, requests keep using the loaded walls.
+            with open(self.mapping_path, 'a', newline='') as csvfile:
+                csv.writer(csvfile).writerow([5, 8, 5, 10])
+            request = {"op": "path", "map": "room", "start": [2, 2], "end": [8, 2]}
+            return await service.handle_request(request), await service.handle_request(dict(request, radius=0.2))
+        point, inflated = asyncio.run(run())
+
+        self.assertTrue(point["ok"], "Expected a path through the gap of the loaded map.")
+        self.assertTrue(inflated["ok"], "Expected inflated maps to be built from the loaded walls, not the file.")
+
+    def test_long_request(self):
+        async def run():
+            service = ps.PlanningService(request_limit=1024)
+            await service.load_map("room", self.mapping_path)
+            server = await service.start(("127.0.0.1", 0))
+            async with server:
+                reader, writer = await ps.open_connection(server.sockets[0].getsockname()[:2])
+                request = {"op": "path", "map": "room", "start": [2, 2], "end": [8, 2], "padding": "x" * 2000}
+                writer.write(json.dumps(request).encode() + b"\n")
+                await writer.drain()
+                response = await reader.readline()
+                writer.close()
+            return response
+        response = json.loads(asyncio.run(run()))
+
+        self.assertFalse(response["ok"], "Expected a request beyond the limit to be answered with an error.")
+        self.assertIn("1024", response["error"], "Expected the error to name the limit.")
+
+    def test_socket_clients(self):
+        async def run(address):
+            service = ps.PlanningService()
+            await service.load_map("room", self.mapping_path)
+            server = await service.start(address)
+            if not isinstance(address, str):
+                address = server.sockets[0].getsockname()[:2]
+            async with server:
+                reader, writer = await ps.open_connection(address)
+                writer.write(b"not json\n")
+                await writer.drain()
+                invalid = await reader.readline()
+                writer.close()
+                result = await ps.run_load_test(address, "room", [([2, 2], [8, 2]), ([1, 9], [9, 9])],
+                                                clients=3, requests_per_client=4)
+            return invalid, result
+        for address in [("127.0.0.1", 0), os.path.join(self.temp_dir.name, "planner.sock")]:
+            invalid, result = asyncio.run(run(address))
+
+            self.assertIn(b'"ok": false', invalid,
+                "Expected invalid JSON to be answered with an error.")
+            self.assertEqual(result["requests"], 12,
+                "Expected every request from every concurrent client to be answered.")
+            self.assertGreater(result["throughput"], 0,
+                "Expected a positive throughput.")
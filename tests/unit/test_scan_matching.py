@@ -0,0 +1,106 @@
+# Regular Modules:
+import numpy as np
+import unittest
+from collections import OrderedDict
+
+# Test Subject Modules:
+from work_dir import loader as l
+from work_dir import scan_matching as sm
+
+class TestScanMatchingMethods(unittest.TestCase):
+
+    @staticmethod
+    def make_scene():
+        # Points along three walls of an asymmetric room, so the alignment is unique.
+        t = np.linspace(0, 1, 200)[:, None]
+        walls = [np.array([0, 0]) + t * np.array([6, 0]),
+                 np.array([6, 0]) + t * np.array([0, 3]),
+                 np.array([0, 0]) + t[:100] * np.array([0, 5])]
+        return np.concatenate(walls, axis=0)
+
+    def test_best_fit_rotations(self):
+        angles = np.array([0.3, -1.2, 2.5])
+        points = np.random.rand(50, 2)
+        points -= points.mean(axis=0)
+        covariances = np.stack([points.T.dot(points.dot(rotation.T)) for rotation in sm.rotation_matrices(angles)])
+
+        self.assertTrue(np.allclose(sm.best_fit_rotations(covariances), angles),
+            "Expected the batched SVD solve to recover each rotation angle.")
+
+    def test_match_scans(self):
+        scene = self.make_scene()
+        rotation = sm.rotation_matrices(np.array([0.05]))[0]
+        drifted = scene.dot(rotation.T) + np.array([0.1, -0.15])
+        angles, translations, residuals = sm.match_scans([drifted, scene], [scene, scene])
+        aligned = drifted.dot(sm.rotation_matrices(angles)[0].T) + translations[0]
+
+        self.assertTrue(np.allclose(aligned, scene, atol=1e-3),
+            "Expected the drifted scan to be moved back onto the target scan.")
+        self.assertTrue(np.allclose([angles[1], *translations[1]], 0, atol=1e-9),
+            "Expected identical scans to get the identity transform.")
+        self.assertTrue((residuals < 1e-3).all(),
+            "Expected near zero residuals after alignment.")
+
+    def test_align_sweeps(self):
+        scene = self.make_scene()
+        positions = np.array([[1, 1], [2, 1], [3, 1]], dtype=float)
+        drift = np.array([[0, 0], [0.1, 0.05], [0.2, 0.1]])
+        sweep_dict = OrderedDict()
+        for i, position in enumerate(positions):
+            sweep = l.Sweep()
+            sweep.drone_position = position + drift[i]
+            sweep.lidar_cartesian = scene + drift[i]
+            sweep_dict[i] = sweep
+        sweep_ids, corrected, headings, residuals = sm.align_sweeps(sweep_dict)
+        sm.apply_corrections(sweep_dict, sweep_ids, corrected, headings)
+
+        self.assertEqual(sweep_ids, [0, 1, 2],
+            "Expected all sweeps with data to be aligned.")
+        self.assertTrue(np.allclose(corrected, positions, atol=1e-3),
+            "Expected odometry drift to be removed from the drone positions.")
+        self.assertTrue(np.allclose(sweep_dict[2].lidar_cartesian, scene, atol=5e-3),
+            "Expected corrected sweeps to line up with the first sweep.")
+        self.assertEqual(residuals[0], 0,
+            "Expected the reference sweep to have zero residual.")
+
+    def test_SweepAligner(self):
+        scene = self.make_scene()
+        positions = np.array([[1, 1], [2, 1], [3, 1], [4, 1]], dtype=float)
+        drift = np.array([[0, 0], [0.1, 0.05], [0.2, 0.1], [0.25, 0.2]])
+        sweep_dict = OrderedDict()
+        for i, position in enumerate(positions):
+            sweep = l.Sweep()
+            sweep.drone_position = position + drift[i]
+            sweep.lidar_cartesian = scene + drift[i]
+            sweep_dict[i] = sweep
+        sweep_dict[4] = l.Sweep() # Sweeps without data should be skipped.
+        aligner = sm.SweepAligner()
+        updates = [aligner.add_sweep(sweep) for sweep in sweep_dict.values()]
+        sweep_ids, corrected, headings, residuals = sm.align_sweeps(sweep_dict)
+
+        self.assertIsNone(updates[-1], "Expected no update for a sweep without data.")
+        self.assertTrue(np.allclose([update[0] for update in updates[:-1]], corrected),
+            "Expected the same positions as aligning the whole flight.")
+        self.assertTrue(np.allclose([update[1] for update in updates[:-1]], headings),
+            "Expected the same headings as aligning the whole flight.")
+
+    def test_align_sweeps_masked(self):
+        scene = self.make_scene()
+        positions = np.array([[1, 1], [2, 1], [3, 1]], dtype=float)
+        drift = np.array([[0, 0], [0.1, 0.05], [0.2, 0.1]])
+        sweep_dict = OrderedDict()
+        for i, position in enumerate(positions):
+            # A ghost copy of the scene, shifted differently in every sweep, that a filter has removed.
+            stray = scene + [0.2 * (i + 1), 0.1]
+            sweep = l.Sweep()
+            sweep.drone_position = position + drift[i]
+            sweep.lidar_cartesian = np.concatenate([scene + drift[i], stray])
+            sweep.lidar_polar = np.zeros((len(sweep.lidar_cartesian), 2))
+            sweep.mask = np.arange(len(sweep.lidar_cartesian)) < len(scene)
+            sweep_dict[i] = sweep
+        sweep_ids, corrected, headings, residuals = sm.align_sweeps(sweep_dict)
+
+        self.assertTrue(np.allclose(corrected, positions, atol=1e-3),
+            "Expected points removed by the masks to be left out of the alignment.")
+        self.assertTrue((residuals < 1e-3).all(),
+            "Expected near zero residuals over the kept points.")
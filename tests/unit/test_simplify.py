@@ -0,0 +1,58 @@
+# Regular Modules:
+import numpy as np
+import unittest
+
+# Test Subject Modules:
+from work_dir import simplify as sp
+
+class TestSimplifyMethods(unittest.TestCase):
+
+    @staticmethod
+    def dense_square(size, offset=0.0, points_per_edge=10, noise=0.0):
+        corners = np.array([[0, 0], [size, 0], [size, size], [0, size]], dtype=float) + offset
+        walls = np.concatenate([corners, np.roll(corners, -1, axis=0)], axis=1)
+        walls = sp.densify_walls(walls, points_per_edge, noise)
+        return walls[:, :2]
+
+    def test_douglas_peucker(self):
+        square = self.dense_square(4, noise=0.001)
+        triangle = np.array([[0, 0], [1, 0], [0, 1]], dtype=float)
+        kept = sp.douglas_peucker([square, triangle], max_deviation=0.01)
+
+        self.assertEqual(sorted(square[kept[0]].tolist()), [[0, 0], [0, 4], [4, 0], [4, 4]],
+            "Expected only the corners of a noisy square to be kept.")
+        self.assertEqual(kept[1].tolist(), [0, 1, 2],
+            "Expected a triangle to keep all its vertices.")
+
+    def test_simplify_polygons(self):
+        square = self.dense_square(4, noise=0.001)
+        simplified, removed = sp.simplify_polygons([square], max_deviation=0.01)
+        unchanged, none_removed = sp.simplify_polygons([square], max_deviation=None)
+
+        self.assertEqual(removed, len(square) - 4,
+            "Expected removed to count the dropped vertices.")
+        self.assertEqual(np.sign(sp.signed_areas(simplified)).tolist(), np.sign(sp.signed_areas([square])).tolist(),
+            "Expected orientation to be kept.")
+        self.assertIs(unchanged[0], square, "Expected no simplification without max_deviation.")
+        self.assertEqual(none_removed, 0, "Expected nothing removed without max_deviation.")
+
+    def test_simplify_polygons_keeps_crossing_free(self):
+        # A dent in the bottom wall, with a small polygon in the dent reaching below the wall line.
+        outer = np.array([[0, 0], [2, 0], [2.5, 0.3], [3, 0], [5, 0], [5, 5], [0, 5]], dtype=float)
+        inner = np.array([[2.4, -0.1], [2.6, -0.1], [2.5, 0.15]], dtype=float)
+        simplified, removed = sp.simplify_polygons([outer, inner], max_deviation=0.5)
+
+        self.assertEqual(simplified[0].tolist(), outer.tolist(),
+            "Expected the outer polygon to be kept as it would cross the inner polygon when simplified.")
+        self.assertEqual(removed, 0, "Expected nothing to be removed.")
+        alone, removed_alone = sp.simplify_polygons([outer], max_deviation=0.5)
+        self.assertEqual(removed_alone, 3, "Expected the dent and collinear points to go without the inner polygon.")
+
+    def test_simplify_polygons_keeps_orientation_of_thin_polygons(self):
+        # A small sliver (area below max_deviation squared) whose simplified triangle turns the other way.
+        sliver = np.array([[0.4, 1.2], [0.4, 0.0], [0.0, 0.8], [1.6, 2.8]], dtype=float)
+        simplified, removed = sp.simplify_polygons([sliver], max_deviation=1.0)
+
+        self.assertEqual(simplified[0].tolist(), sliver.tolist(),
+            "Expected a polygon whose orientation would flip to be kept as it was, however small.")
+        self.assertEqual(removed, 0, "Expected nothing to be removed.")
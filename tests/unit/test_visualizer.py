@@ -0,0 +1,113 @@
+# Regular Modules:
+import numpy as np
+import unittest
+import tempfile
+import os
+from collections import OrderedDict
+from types import SimpleNamespace
+from unittest.mock import patch
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# Test Subject Modules:
+from work_dir import loader as l
+from work_dir import visualizer as v
+
+class TestVisualizerMethods(unittest.TestCase):
+
+    def test_density_raster(self):
+        points = np.array([[0.5, 0.5], [0.6, 0.6], [3.5, 1.5], [10.0, 10.0]])
+        raster = v.density_raster(points, (0, 4), (0, 2), shape=(2, 4))
+
+        self.assertEqual(raster.shape, (2, 4),
+            "Expected raster to have the requested shape (rows, cols).")
+        self.assertEqual(raster.sum(), 3,
+            "Expected points outside the limits not to be counted.")
+        self.assertEqual(raster[0, 0], 2,
+            "Expected both points near origin to fall in the first cell.")
+        self.assertEqual(raster[1, 3], 1,
+            "Expected row index to follow y and column index to follow x.")
+        self.assertTrue((v.density_raster([points[:1], points[1:3], points[3:]], (0, 4), (0, 2), shape=(2, 4)) == raster).all(),
+            "Expected points given sweep by sweep to be counted like the concatenated points.")
+
+    def test_get_axis_limits(self):
+        sweep_dict = OrderedDict()
+        for i in range(3):
+            sweep = l.Sweep()
+            sweep.drone_position = np.array([i, i], dtype=float)
+            # A far outlier removed by the mask should not widen the limits.
+            sweep.lidar_cartesian = np.concatenate([np.random.rand(10, 2) + i, [[100.0, 100.0]]])
+            sweep.lidar_polar = np.zeros((11, 2))
+            sweep.mask = np.arange(11) < 10
+            sweep_dict[i] = sweep
+        sweep_dict[3] = l.Sweep() # Sweeps without data should be skipped.
+        all_points = np.concatenate([sweep.lidar_cartesian[:10] for sweep in list(sweep_dict.values())[:3]])
+        (x_min, x_max), (y_min, y_max) = v.get_axis_limits(sweep_dict, margin=0)
+
+        self.assertEqual([x_min, y_min], np.minimum(all_points.min(axis=0), 0).tolist(),
+            "Expected lower limits to cover all points and drone positions.")
+        self.assertEqual([x_max, y_max], np.maximum(all_points.max(axis=0), 2).tolist(),
+            "Expected upper limits to cover all points and drone positions.")
+
+    def test_IndexTracker_blit(self):
+        sweep_dict = OrderedDict()
+        for i in range(3):
+            sweep = l.Sweep()
+            sweep.drone_position = np.array([i, i], dtype=float)
+            sweep.lidar_cartesian = np.random.rand(10, 2) + i
+            sweep_dict[i] = sweep
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        tracker = v._IndexTracker(figure.subplots(1, 2), sweep_dict, v.get_axis_limits(sweep_dict))
+        figure.canvas.draw()
+        tracker.onpick(SimpleNamespace(ind=[1]))
+        blitted = np.asarray(figure.canvas.buffer_rgba()).copy()
+        figure.canvas.draw()
+
+        self.assertTrue((blitted == np.asarray(figure.canvas.buffer_rgba())).all(),
+            "Expected a blitted scroll step to look like drawing the whole figure.")
+
+    def test_export_sweep_frames(self):
+        sweep_dict = OrderedDict()
+        for i in range(4):
+            sweep = l.Sweep()
+            sweep.drone_position = np.array([i, i], dtype=float)
+            sweep.lidar_cartesian = np.random.rand(10, 2) + i
+            sweep_dict[i] = sweep
+        planned_path = np.array([[0, 0], [1, 2], [3, 3]], dtype=float)
+        with tempfile.TemporaryDirectory() as output_dir:
+            frame_paths = v.export_sweep_frames(sweep_dict, output_dir, planned_path, processes=2)
+
+            self.assertEqual(len(frame_paths), len(sweep_dict),
+                "Expected one frame per sweep.")
+            self.assertEqual(frame_paths, sorted(frame_paths),
+                "Expected frames to be returned in sweep order.")
+            self.assertTrue(all(os.path.getsize(path) > 0 for path in frame_paths),
+                "Expected every frame to be written as a non-empty PNG file.")
+
+    def test_export_video_cleanup(self):
+        sweep_dict = OrderedDict()
+        sweep = l.Sweep()
+        sweep.drone_position = np.array([0, 0], dtype=float)
+        sweep.lidar_cartesian = np.random.rand(10, 2)
+        sweep_dict[0] = sweep
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Rendering fails before ffmpeg runs, the frame directory should still be removed.
+            with patch.object(tempfile, 'tempdir', temp_dir), \
+                 patch.object(v.shutil, 'which', return_value='ffmpeg'), \
+                 patch.object(v, 'Pool', side_effect=OSError("no processes")):
+                with self.assertRaises(OSError):
+                    v.export_sweep_frames(sweep_dict, os.path.join(temp_dir, 'flight.mp4'))
+
+            self.assertEqual(os.listdir(temp_dir), [],
+                "Expected no frames left behind when rendering a video fails.")
+
+    def test_read_path_csv(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            path_file = os.path.join(output_dir, "path.csv")
+            with open(path_file, 'w') as csvfile:
+                csvfile.write("34,1\n12.5,3.5\n35,1\n8.0,5.25\n36,1\n5.8,6.8\n")
+            planned_path = v.read_path_csv(path_file)
+
+        self.assertEqual(planned_path.tolist(), [[12.5, 3.5], [8.0, 5.25], [5.8, 6.8]],
+            "Expected the stored points in order, without their ID rows.")
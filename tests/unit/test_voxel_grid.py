@@ -0,0 +1,70 @@
+# Regular Modules:
+import numpy as np
+import unittest
+from collections import OrderedDict
+
+# Test Subject Modules:
+from work_dir import loader as l
+from work_dir import voxel_grid as vgrid
+
+class TestVoxelGridMethods(unittest.TestCase):
+
+    def test_voxel_downsample(self):
+        points = np.array([[0.1, 0.1], [0.3, 0.3], [1.5, 0.5], [-0.5, -0.5]])
+        centroids, counts = vgrid.voxel_downsample(points, voxel_size=1.0)
+        order = np.lexsort(centroids.T)
+        centroids, counts = centroids[order], counts[order]
+
+        self.assertEqual(len(centroids), 3,
+            "Expected one point per occupied cell.")
+        self.assertEqual(counts.tolist(), [1, 2, 1],
+            "Expected counts to be the number of points in each cell.")
+        self.assertTrue(np.allclose(centroids[1], [0.2, 0.2]),
+            "Expected the representative point to be the centroid of the cell.")
+        self.assertTrue(np.allclose(centroids[0], [-0.5, -0.5]),
+            "Expected negative coordinates to get their own cell.")
+
+    def test_VoxelGrid_incremental(self):
+        points = np.random.rand(1000, 2) * 10 - 5
+        grid = vgrid.VoxelGrid(0.5)
+        for sweep_id, chunk in enumerate(np.array_split(points, 4)):
+            grid.add(chunk, sweep_id)
+        batch = vgrid.VoxelGrid(0.5)
+        batch.add(points)
+
+        self.assertEqual(grid.cells.tolist(), batch.cells.tolist(),
+            "Expected adding sweep by sweep to give the same cells as one batch.")
+        self.assertTrue(np.allclose(grid.centroids, batch.centroids),
+            "Expected adding sweep by sweep to give the same centroids as one batch.")
+        self.assertEqual(grid.counts.sum(), len(points),
+            "Expected every point to be counted once.")
+        self.assertTrue((grid.first_sweeps <= grid.last_sweeps).all(),
+            "Expected first sweep to never come after last sweep.")
+        cells = np.floor(points / 0.5).astype(int)
+        first_cell = cells[0].tolist()
+        index = grid.cells.tolist().index(first_cell)
+        self.assertEqual(grid.first_sweeps[index], 0,
+            "Expected the cell of the first point to be first seen in sweep 0.")
+
+    def test_add_sweep_dict(self):
+        sweep_dict = OrderedDict()
+        for i in range(3):
+            sweep = l.Sweep()
+            sweep.lidar_cartesian = np.array([[0.1, 0.1], [i + 2.1, 0.1]])
+            sweep_dict[i] = sweep
+        sweep_dict[3] = l.Sweep()
+        grid = vgrid.VoxelGrid(1.0)
+        grid.add_sweep_dict(sweep_dict)
+        shared = grid.cells.tolist().index([0, 0])
+
+        self.assertEqual(len(grid), 4,
+            "Expected one shared cell plus one cell per sweep.")
+        self.assertEqual((grid.first_sweeps[shared], grid.last_sweeps[shared], grid.counts[shared]), (0, 2, 3),
+            "Expected the shared cell to be seen from sweep 0 to sweep 2 by three points.")
+
+        sweep_dict[0].lidar_polar = np.zeros((2, 2))
+        sweep_dict[0].mask = np.array([True, False])
+        grid = vgrid.VoxelGrid(1.0)
+        grid.add_sweep_dict(sweep_dict)
+        self.assertEqual(len(grid), 3,
+            "Expected points removed by a sweep's mask to be left out.")
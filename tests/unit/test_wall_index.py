@@ -0,0 +1,56 @@
+# Regular Modules:
+import numpy as np
+import unittest
+
+# Test Subject Modules:
+from work_dir import wall_index as wi
+
+class TestWallIndexMethods(unittest.TestCase):
+
+    def test_segments_intersect(self):
+        wall = np.array([[0, 0, 2, 0]], dtype=float)
+        crossing = np.array([[1, -1, 1, 1]], dtype=float)
+        touching = np.array([[1, 0, 1, 1]], dtype=float)
+        along = np.array([[1, 0, 3, 0]], dtype=float)
+        apart = np.array([[3, -1, 3, 1]], dtype=float)
+
+        self.assertTrue(wi.segments_intersect(crossing, wall)[0],
+            "Expected crossing segments to intersect.")
+        self.assertFalse(wi.segments_intersect(touching, wall)[0],
+            "Expected a segment ending on the wall not to be a proper crossing.")
+        self.assertTrue(wi.segments_intersect(touching, wall, touching=True)[0],
+            "Expected a segment ending on the wall to intersect when touching counts.")
+        self.assertFalse(wi.segments_intersect(along, wall)[0],
+            "Expected collinear overlap not to be a proper crossing.")
+        self.assertTrue(wi.segments_intersect(along, wall, touching=True)[0],
+            "Expected collinear overlap to intersect when touching counts.")
+        self.assertFalse(wi.segments_intersect(apart, wall, touching=True)[0],
+            "Expected separate segments not to intersect.")
+
+    def test_WallIndex(self):
+        rng = np.random.default_rng(1)
+        walls = wi._random_walls(300, 40, rng)
+        queries = np.concatenate([rng.random((500, 2)) * 50 - 5, rng.random((500, 2)) * 50 - 5], axis=1)
+        wall_index = wi.WallIndex(walls, cell_size=2.0)
+        brute = np.array([wi.segments_intersect(np.repeat(query[None], len(walls), axis=0), walls).any()
+                          for query in queries])
+
+        self.assertEqual(wall_index.intersects(queries).tolist(), brute.tolist(),
+            "Expected the grid to give the same answers as testing every wall.")
+        self.assertEqual(wall_index.line_of_sight(queries[:, :2], queries[:, 2:]).tolist(), (~brute).tolist(),
+            "Expected line of sight to be the opposite of intersects.")
+        self.assertEqual(wi.WallIndex(walls).intersects(queries).tolist(), brute.tolist(),
+            "Expected the default cell size to give the same answers.")
+
+    def test_validate_path(self):
+        walls = np.array([[0, 0, 10, 0], [5, 0, 5, 8]], dtype=float)
+        wall_index = wi.WallIndex(walls)
+        around = np.array([[2, 2], [5, 8], [8, 2]], dtype=float)
+        through = np.array([[2, 2], [2, 4], [8, 4], [8, 2]], dtype=float)
+
+        self.assertIsNone(wi.validate_path(around, wall_index),
+            "Expected a path passing the end of a wall to be valid.")
+        self.assertEqual(wi.validate_path(through, wall_index), (1, 1),
+            "Expected the second leg to be reported as crossing the second wall.")
+        self.assertEqual(wi.validate_path(around, wall_index, touching=True), (0, 1),
+            "Expected touching the wall end to count when touching is True.")
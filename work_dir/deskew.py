@@ -0,0 +1,155 @@
+'''Motion de-skew of LIDAR sweeps.
+
+SweepDict converts all beams of a sweep from the one drone_position of the sweep,
+but the drone keeps moving while the beams are taken. Here each beam gets its own
+position: sweep ids are used as time, beam i of a sweep of N beams is taken at
+time sweep_id + i / N - anchor (anchor is the part of the sweep done when
+drone_position was recorded), and the position at that time is interpolated
+linearly between the drone positions of the sweeps around it.
+'''
+# Regular Modules
+import numpy as np
+from scipy.spatial import cKDTree
+from collections import OrderedDict
+import time
+import os
+
+def beam_times(sweep_ids, counts, anchor=0.0):
+    # Time (in sweeps) of every beam of sweeps sweep_ids (S,) with counts (S,) beams, concatenated.
+    owner = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.asarray(sweep_ids, dtype=float)[owner] + local / np.asarray(counts)[owner] - anchor
+
+def interpolate_positions(times, position_times, positions):
+    '''Drone positions (M, 2) at times (M,) on the piecewise linear trajectory
+    through positions (K, 2) at sorted position_times (K,). Extrapolates from the
+    first and last step outside the trajectory.'''
+    if len(positions) == 1:
+        return np.repeat(positions, len(times), axis=0)
+    step = np.clip(np.searchsorted(position_times, times, side='right') - 1, 0, len(position_times) - 2)
+    fraction = (times - position_times[step]) / (position_times[step + 1] - position_times[step])
+    return positions[step] + fraction[:, None] * (positions[step + 1] - positions[step])
+
+def to_cartesian(positions, lidar_polar):
+    # Same conversion as SweepDict, with one position (M, 2) per point of lidar_polar (M, 2).
+    angles = np.radians(lidar_polar[:, 0])
+    distances = lidar_polar[:, 1] / 1000
+    return positions + distances[:, None] * np.stack([np.cos(angles), -np.sin(angles)], axis=1)
+
+def deskew_sweeps(sweep_dict, anchor=0.0):
+    '''Replaces lidar_cartesian of every sweep with drone_position and lidar_polar
+    by points projected from interpolated beam positions, all sweeps in one pass.
+    The trajectory uses every sweep with a drone_position, also those without points.'''
+    with_position = [(key, sweep) for key, sweep in sweep_dict.items() if sweep.drone_position is not None]
+    with_points = [(key, sweep) for key, sweep in with_position if sweep.lidar_polar is not None]
+    if not with_points:
+        return
+    position_times = np.array([key for key, _ in with_position], dtype=float)
+    positions = np.array([sweep.drone_position for _, sweep in with_position])
+    order = np.argsort(position_times, kind='stable')
+    position_times, positions = position_times[order], positions[order]
+
+    counts = np.array([len(sweep.lidar_polar) for _, sweep in with_points])
+    times = beam_times([key for key, _ in with_points], counts, anchor)
+    lidar_polar = np.concatenate([sweep.lidar_polar for _, sweep in with_points], axis=0)
+    cartesian = to_cartesian(interpolate_positions(times, position_times, positions), lidar_polar)
+    for (_, sweep), points in zip(with_points, np.split(cartesian, np.cumsum(counts)[:-1])):
+        sweep.lidar_cartesian = points
+
+def distance_to_walls(points, walls, chunk_size=20000):
+    # Distance (M,) from every point (M, 2) to the nearest wall segment of walls (W, 4).
+    starts, ends = walls[:, :2], walls[:, 2:]
+    direction = ends - starts
+    lengths = np.maximum(np.einsum('wi,wi->w', direction, direction), 1e-12)
+    distances = []
+    for chunk in np.array_split(points, max(1, len(points) // chunk_size)):
+        offsets = chunk[:, None] - starts[None]
+        along = np.clip(np.einsum('mwi,wi->mw', offsets, direction) / lengths, 0, 1)
+        closest = starts[None] + along[..., None] * direction[None]
+        distances.append(np.linalg.norm(chunk[:, None] - closest, axis=2).min(axis=1))
+    return np.concatenate(distances)
+
+def _simulate_flight(walls, positions, beams=533):
+    '''Sweeps taken while flying in a straight line from positions[k] to positions[k + 1]
+    (positions (S + 1, 2)), with beams evenly spaced in time and angle and distances
+    ray cast against walls (W, 4). Sweep k has drone_position positions[k]; the last
+    sweep only has a drone_position. Output: OrderedDict of Sweeps.'''
+    # Imported here, loader imports this module for SweepDict(..., deskew=True).
+    from .loader import Sweep
+    angles = np.arange(beams) * 360 / beams
+    directions = np.stack([np.cos(np.radians(angles)), -np.sin(np.radians(angles))], axis=1)
+    edges = walls[:, 2:] - walls[:, :2]
+    sweep_dict = OrderedDict()
+    for k in range(len(positions) - 1):
+        origins = positions[k] + (np.arange(beams) / beams)[:, None] * (positions[k + 1] - positions[k])
+        offsets = walls[None, :, :2] - origins[:, None]
+        denominator = directions[:, None, 0] * edges[None, :, 1] - directions[:, None, 1] * edges[None, :, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (offsets[..., 0] * edges[None, :, 1] - offsets[..., 1] * edges[None, :, 0]) / denominator
+            u = (offsets[..., 0] * directions[:, None, 1] - offsets[..., 1] * directions[:, None, 0]) / denominator
+        t = np.where((t > 0) & (u >= 0) & (u <= 1), t, np.inf).min(axis=1)
+        sweep = Sweep()
+        sweep.drone_position = positions[k].astype(float)
+        sweep.lidar_polar = np.stack([angles, np.where(np.isinf(t), 0, t * 1000)], axis=1)
+        sweep.lidar_cartesian = to_cartesian(np.repeat(positions[k][None], beams, axis=0), sweep.lidar_polar)
+        sweep_dict[k] = sweep
+    sweep_dict[len(positions) - 1] = Sweep()
+    sweep_dict[len(positions) - 1].drone_position = positions[-1].astype(float)
+    return sweep_dict
+
+def mean_neighbour_distance(points, k=8):
+    # Mean distance from each point to its k nearest neighbours, lower for sharper maps.
+    distances, _ = cKDTree(points).query(points, k + 1)
+    return distances[:, 1:].mean()
+
+if __name__ == '__main__':
+    from .loader import Sweep, SweepDict
+    from .filters import RangeFilter
+
+    flight_path = os.path.join("data", "FlightPath.csv")
+    lidar_path = os.path.join("data", "LIDARPoints.csv")
+    sweep_dict = SweepDict(lidar_path, flight_path, filters=[RangeFilter()])
+    static = sweep_dict.get_all_lidar_cartesian(masked=False)
+    sharpness = mean_neighbour_distance(sweep_dict.get_all_lidar_cartesian())
+    start = time.perf_counter()
+    deskew_sweeps(sweep_dict)
+    elapsed = time.perf_counter() - start
+    moved = np.linalg.norm(sweep_dict.get_all_lidar_cartesian(masked=False) - static, axis=1)
+    print("Sample flight: %d points de-skewed in %.2f ms (%.1f M points/s), points moved %.3f m on average, "
+          "%.3f m at most" % (len(static), elapsed * 1000, len(static) / elapsed / 1e6, moved.mean(), moved.max()))
+    # The sample sweeps look taken while hovering: their map is sharper without de-skew.
+    print("    mean distance to 8 nearest points: static %.1f mm, de-skewed %.1f mm"
+          % (sharpness * 1000, mean_neighbour_distance(sweep_dict.get_all_lidar_cartesian()) * 1000))
+
+    # Throughput on a long flight: the sample flight repeated 300 times.
+    sweeps = [sweep for sweep in sweep_dict.values() if sweep.lidar_polar is not None]
+    large = OrderedDict()
+    for i in range(300 * len(sweeps)):
+        large[i] = Sweep()
+        large[i].drone_position = sweeps[i % len(sweeps)].drone_position
+        large[i].lidar_polar = sweeps[i % len(sweeps)].lidar_polar
+    points = sum(len(sweep.lidar_polar) for sweep in large.values())
+    start = time.perf_counter()
+    deskew_sweeps(large)
+    elapsed = time.perf_counter() - start
+    print("%d sweeps: %d points de-skewed in %.1f ms (%.1f M points/s)"
+          % (len(large), points, elapsed * 1000, points / elapsed / 1e6))
+
+    # Accuracy: a 20 x 12 m room flown around at increasing speed.
+    walls = np.array([[0, 0, 20, 0], [20, 0, 20, 12], [20, 12, 0, 12], [0, 12, 0, 0],
+                      [8, 0, 8, 5], [12, 12, 12, 7]], dtype=float)
+    corners = np.array([[2, 2], [18, 2], [18, 10], [2, 10], [2, 2]], dtype=float)
+    for metres_per_sweep in (0.1, 0.5, 1.0):
+        lengths = np.linalg.norm(np.diff(corners, axis=0), axis=1)
+        along = np.arange(0, lengths.sum(), metres_per_sweep)
+        positions = np.stack([np.interp(along, np.concatenate([[0], np.cumsum(lengths)]), corners[:, i])
+                              for i in range(2)], axis=1)
+        simulated = _simulate_flight(walls, positions)
+        before = distance_to_walls(np.concatenate([s.lidar_cartesian for s in simulated.values()
+                                                   if s.lidar_cartesian is not None]), walls)
+        deskew_sweeps(simulated)
+        after = distance_to_walls(np.concatenate([s.lidar_cartesian for s in simulated.values()
+                                                  if s.lidar_cartesian is not None]), walls)
+        print("%.1f m per sweep: distance to the true walls, static %.1f mm mean / %.1f mm max, "
+              "de-skewed %.1f mm mean / %.1f mm max" % (metres_per_sweep, before.mean() * 1000,
+                                                       before.max() * 1000, after.mean() * 1000, after.max() * 1000))
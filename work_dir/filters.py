@@ -0,0 +1,152 @@
+'''Filters for LIDAR points, run over a whole flight at once.
+
+Every filter is called with the polar (N, 2) and cartesian (N, 2) points of the
+points still kept and returns a bool mask (N,), True for points to keep. Filters
+are chained by apply_filters, which stores the result as a mask on each Sweep
+instead of copying the point arrays.
+'''
+# Regular Modules
+import numpy as np
+from scipy.spatial import cKDTree
+import time
+import os
+
+class RangeFilter():
+    '''
+    Keeps points with min_range < distance <= max_range (millimetres, as in
+    lidar_polar). The default removes zero distance returns (no echo).
+    '''
+    name = "range"
+
+    def __init__(self, min_range=0.0, max_range=None):
+        self.min_range = min_range
+        self.max_range = max_range
+
+    def __call__(self, polar, cartesian):
+        mask = polar[:, 1] > self.min_range
+        if self.max_range is not None:
+            mask &= polar[:, 1] <= self.max_range
+        return mask
+
+class AngleFilter():
+    '''
+    Keeps points with angles (degrees) from min_angle to max_angle. If min_angle
+    is larger than max_angle the kept sector wraps around 360 degrees.
+    '''
+    name = "angle"
+
+    def __init__(self, min_angle, max_angle):
+        self.min_angle = min_angle
+        self.max_angle = max_angle
+
+    def __call__(self, polar, cartesian):
+        angles = np.mod(polar[:, 0], 360)
+        low, high = np.mod(self.min_angle, 360), np.mod(self.max_angle, 360)
+        if low <= high:
+            return (angles >= low) & (angles <= high)
+        return (angles >= low) | (angles <= high)
+
+class StatisticalOutlierFilter():
+    '''
+    Removes points whose mean distance to their k nearest neighbours is more
+    than std_ratio standard deviations above the mean of that distance over all
+    points.
+    '''
+    name = "statistical outlier"
+
+    def __init__(self, k=8, std_ratio=2.0):
+        assert k > 0, "Expected k to be positive"
+        self.k = k
+        self.std_ratio = std_ratio
+
+    def __call__(self, polar, cartesian):
+        if len(cartesian) <= self.k:
+            return np.ones(len(cartesian), dtype=bool)
+        # The nearest neighbour of each point is itself.
+        distances, _ = cKDTree(cartesian).query(cartesian, self.k + 1, workers=-1)
+        mean_distances = distances[:, 1:].mean(axis=1)
+        return mean_distances <= mean_distances.mean() + self.std_ratio * mean_distances.std()
+
+class RadiusOutlierFilter():
+    '''
+    Removes points with fewer than min_neighbours other points within radius (metres).
+    '''
+    name = "radius outlier"
+
+    def __init__(self, radius=0.1, min_neighbours=3):
+        assert radius > 0, "Expected radius to be positive"
+        self.radius = radius
+        self.min_neighbours = min_neighbours
+
+    def __call__(self, polar, cartesian):
+        if self.min_neighbours <= 0:
+            return np.ones(len(cartesian), dtype=bool)
+        # Only the distance to the min_neighbours-th neighbour matters, not counting all of them.
+        distances, _ = cKDTree(cartesian).query(cartesian, [self.min_neighbours + 1],
+                                                distance_upper_bound=self.radius, workers=-1)
+        return np.isfinite(distances[:, 0])
+
+def filter_points(polar, cartesian, filters):
+    '''Runs filters one after another on polar (N, 2) and cartesian (N, 2), each
+    one only seeing the points kept by the filters before it.
+    Output: (mask (N,), stats) where stats has one dict per filter with "name",
+    "removed", "seconds" and "points_per_second" (points the filter looked at).'''
+    mask = np.ones(len(polar), dtype=bool)
+    stats = []
+    for point_filter in filters:
+        kept = np.nonzero(mask)[0]
+        start = time.perf_counter()
+        keep = point_filter(polar[kept], cartesian[kept])
+        seconds = time.perf_counter() - start
+        mask[kept[~keep]] = False
+        stats.append({"name": point_filter.name, "removed": int(np.count_nonzero(~keep)), "seconds": seconds,
+                      "points_per_second": len(kept) / seconds if seconds > 0 else np.inf})
+    return mask, stats
+
+def apply_filters(sweep_dict, filters):
+    '''Runs filters (see filter_points) over all sweeps of sweep_dict with cartesian
+    points at once, and sets the mask of each of those sweeps. The masks are views
+    into one array for the whole flight. Returns the stats of filter_points.'''
+    sweeps = [sweep for sweep in sweep_dict.values() if sweep.lidar_cartesian is not None]
+    if not sweeps:
+        return []
+    polar = np.concatenate([sweep.lidar_polar for sweep in sweeps], axis=0)
+    cartesian = np.concatenate([sweep.lidar_cartesian for sweep in sweeps], axis=0)
+    mask, stats = filter_points(polar, cartesian, filters)
+    ends = np.cumsum([len(sweep.lidar_polar) for sweep in sweeps])
+    for sweep, sweep_mask in zip(sweeps, np.split(mask, ends[:-1])):
+        sweep.mask = sweep_mask
+    return stats
+
+def default_filters(max_range=None):
+    # Range gating, then statistical and radius outlier removal with their defaults.
+    return [RangeFilter(max_range=max_range), StatisticalOutlierFilter(), RadiusOutlierFilter()]
+
+if __name__ == '__main__':
+    from .loader import SweepDict
+
+    def report(name, sweep_dict, stats):
+        total = len(sweep_dict.get_all_lidar_polar(masked=False))
+        seconds = sum(stat["seconds"] for stat in stats)
+        print("%s: %d points, %d kept, %.1f ms (%.2f M points/s)"
+              % (name, total, len(sweep_dict.get_all_lidar_polar()), seconds * 1000, total / seconds / 1e6))
+        for stat in stats:
+            print("    %s: removed %d, %.1f ms (%.2f M points/s)"
+                  % (stat["name"], stat["removed"], stat["seconds"] * 1000, stat["points_per_second"] / 1e6))
+
+    flight_path = os.path.join("data", "FlightPath.csv")
+    lidar_path = os.path.join("data", "LIDARPoints.csv")
+    sweep_dict = SweepDict(lidar_path, flight_path)
+    report("Sample flight", sweep_dict, sweep_dict.apply_filters(default_filters()))
+
+    # A larger flight: the sample flight repeated over a 10 x 10 grid of floors, 30 m apart.
+    large = SweepDict(lidar_path, flight_path)
+    sweeps = [sweep for sweep in large.values() if sweep.lidar_cartesian is not None]
+    for i in range(100 * len(sweeps)):
+        sweep = large[1000 + i]
+        source = sweeps[i % len(sweeps)]
+        offset = 30.0 * np.array(divmod(i // len(sweeps), 10), dtype=float)
+        sweep.drone_position = source.drone_position + offset
+        sweep.lidar_polar = source.lidar_polar
+        sweep.lidar_cartesian = source.lidar_cartesian + offset
+    report("Sample flight x100", large, large.apply_filters(default_filters()))
@@ -0,0 +1,226 @@
+'''Compact binary archive format for LIDAR flights.
+
+Layout of a flight archive file:
+    header | chunk | chunk | ... | index
+The header holds the format version, the quantization steps and where the index
+starts. Every sweep is one chunk: its angles and distances are quantized to fixed
+point integers, delta encoded within the sweep, zigzag mapped to unsigned
+integers, byte shuffled (all lowest bytes first, ...) and compressed with zlib.
+The index has one fixed size row per sweep (id, drone position, number of points,
+chunk offset and size), so one sweep can be decoded by reading only its chunk.
+'''
+# Regular Modules
+import numpy as np
+import struct
+import zlib
+import time
+import csv
+import os
+
+MAGIC = b'LIDARZ\x00\x01'
+VERSION = 1
+# magic, version, angle step, distance step, sweep count, index offset
+_HEADER = struct.Struct('<8sHddIQ')
+_INDEX_DTYPE = np.dtype([('sweep_id', '<i8'), ('has_position', 'u1'), ('x', '<f8'), ('y', '<f8'),
+                         ('point_count', '<u4'), ('offset', '<u8'), ('size', '<u4')])
+
+def is_flight_archive(file_path):
+    # True if the file at file_path starts with the flight archive magic bytes.
+    with open(file_path, 'rb') as archive_file:
+        return archive_file.read(len(MAGIC)) == MAGIC
+
+def _zigzag(values):
+    # Maps signed int64 to unsigned so small magnitudes give small numbers, must fit in uint32.
+    return ((values << 1) ^ (values >> 63)).astype(np.uint32)
+
+def _unzigzag(values):
+    values = values.astype(np.int64)
+    return (values >> 1) ^ -(values & 1)
+
+def _shuffle(values):
+    # Groups the bytes of uint32 values by significance, which compresses better. Stored little endian.
+    return values.astype('<u4').view(np.uint8).reshape(-1, 4).T.tobytes()
+
+def _unshuffle(data, count):
+    return np.frombuffer(data, dtype=np.uint8).reshape(4, count).T.copy().view('<u4').reshape(-1)
+
+def encode_sweeps(polar_sweeps, angle_step=1e-6, distance_step=1.0, level=6):
+    '''Encodes a list of lidar_polar arrays (N, 2) to one compressed chunk per sweep.
+    Quantization and delta encoding run over all sweeps at once.'''
+    counts = np.array([len(polar) for polar in polar_sweeps])
+    if counts.sum() == 0:
+        return [b''] * len(polar_sweeps)
+    polar = np.concatenate([polar for polar in polar_sweeps if len(polar)], axis=0)
+    quantized = np.round(polar / [angle_step, distance_step]).astype(np.int64)
+    deltas = np.diff(quantized, axis=0, prepend=0)
+    # Restart the deltas at the first point of every sweep.
+    sweep_starts = (np.cumsum(counts) - counts)[counts > 0]
+    deltas[sweep_starts] = quantized[sweep_starts]
+    # Zigzag mapped deltas are stored as uint32, anything outside int32 would wrap around silently.
+    limits = np.iinfo(np.int32)
+    if deltas.min() < limits.min or deltas.max() > limits.max:
+        raise ValueError("Quantized LIDAR values do not fit in 32 bits, use a larger angle_step or distance_step")
+    encoded = _zigzag(deltas)
+    chunks = []
+    for start, count in zip(np.cumsum(counts) - counts, counts):
+        sweep = encoded[start:start + count]
+        # Angles of the sweep followed by its distances.
+        chunks.append(zlib.compress(_shuffle(np.ascontiguousarray(sweep.T).reshape(-1)), level) if count else b'')
+    return chunks
+
+def decode_sweep(chunk, point_count, angle_step, distance_step):
+    # Decodes one chunk made by encode_sweeps back to lidar_polar of shape (N, 2).
+    if point_count == 0:
+        return np.empty((0, 2))
+    values = _unshuffle(zlib.decompress(chunk), 2 * point_count)
+    deltas = _unzigzag(values).reshape(2, point_count).T
+    return np.cumsum(deltas, axis=0) * np.array([angle_step, distance_step])
+
+def write_flight_archive(sweep_dict, archive_path, angle_step=1e-6, distance_step=1.0, level=6):
+    '''Writes all sweeps of sweep_dict to a flight archive at archive_path.
+    angle_step (degrees) and distance_step (millimetres) are the quantization steps,
+    values are rounded to the nearest step. With the defaults the sample data only
+    changes for angles given with 7 decimals (at most 5e-7 degrees).'''
+    keys = list(sweep_dict.keys())
+    sweeps = [sweep_dict[key] for key in keys]
+    polar_sweeps = [sweep.lidar_polar if sweep.lidar_polar is not None else np.empty((0, 2))
+                    for sweep in sweeps]
+    chunks = encode_sweeps(polar_sweeps, angle_step, distance_step, level)
+
+    index = np.zeros(len(keys), dtype=_INDEX_DTYPE)
+    index['sweep_id'] = keys
+    index['point_count'] = [len(polar) for polar in polar_sweeps]
+    index['size'] = [len(chunk) for chunk in chunks]
+    index['offset'] = _HEADER.size + np.cumsum(index['size']) - index['size']
+    for row, sweep in zip(index, sweeps):
+        if sweep.drone_position is not None:
+            row['has_position'] = 1
+            row['x'], row['y'] = sweep.drone_position
+    index_offset = _HEADER.size + sum(len(chunk) for chunk in chunks)
+    with open(archive_path, 'wb') as archive_file:
+        archive_file.write(_HEADER.pack(MAGIC, VERSION, angle_step, distance_step, len(keys), index_offset))
+        for chunk in chunks:
+            archive_file.write(chunk)
+        archive_file.write(index.tobytes())
+
+class FlightArchive():
+    '''
+    Reader for flight archives. Only the header and index are read when opened;
+    sweeps are decoded on request, each from its own chunk.
+    '''
+    def __init__(self, archive_path):
+        self._archive_path = archive_path
+        with open(archive_path, 'rb') as archive_file:
+            header = archive_file.read(_HEADER.size)
+            magic, version, self._angle_step, self._distance_step, count, index_offset = _HEADER.unpack(header)
+            assert magic == MAGIC, "Expected a flight archive at %s" % archive_path
+            assert version == VERSION, "Unsupported flight archive version %d" % version
+            archive_file.seek(index_offset)
+            self._index = np.frombuffer(archive_file.read(count * _INDEX_DTYPE.itemsize), dtype=_INDEX_DTYPE)
+        self._rows = {sweep_id: row for row, sweep_id in enumerate(self._index['sweep_id'].tolist())}
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def sweep_ids(self):
+        return self._index['sweep_id'].tolist()
+
+    @property
+    def point_count(self):
+        return int(self._index['point_count'].sum())
+
+    def read_drone_position(self, sweep_id):
+        # Drone position of sweep_id as np.array of shape (2,) or None.
+        row = self._index[self._rows[sweep_id]]
+        if not row['has_position']:
+            return None
+        return np.array([row['x'], row['y']], dtype=float)
+
+    def read_lidar_polar(self, sweep_id, archive_file=None):
+        '''Decodes lidar_polar (N, 2) of sweep_id (None for sweeps without points),
+        reading only that sweep's chunk. archive_file can be an already open file.'''
+        row = self._index[self._rows[sweep_id]]
+        if row['point_count'] == 0:
+            return None
+        if archive_file is None:
+            with open(self._archive_path, 'rb') as archive_file:
+                return self.read_lidar_polar(sweep_id, archive_file)
+        archive_file.seek(int(row['offset']))
+        chunk = archive_file.read(int(row['size']))
+        return decode_sweep(chunk, int(row['point_count']), self._angle_step, self._distance_step)
+
+    def read_all(self, last_id=None):
+        '''Yields (sweep_id, drone_position, lidar_polar) for every sweep in order,
+        stopping after last_id if given.'''
+        with open(self._archive_path, 'rb') as archive_file:
+            for sweep_id in self.sweep_ids:
+                if last_id is not None and sweep_id > last_id:
+                    return
+                yield sweep_id, self.read_drone_position(sweep_id), self.read_lidar_polar(sweep_id, archive_file)
+
+def csv_to_archive(file_path_lidar, file_path_flight_path, archive_path, **kwargs):
+    '''Converts a flight in the CSV layout (LIDARPoints.csv and FlightPath.csv) to a
+    flight archive. kwargs are passed on to write_flight_archive.'''
+    # Imported here, loader imports this module to read archives.
+    from .loader import SweepDict
+    sweep_dict = SweepDict(file_path_lidar, file_path_flight_path, last_id=float('inf'))
+    write_flight_archive(sweep_dict, archive_path, **kwargs)
+
+def _write_rows(file_path, entries, to_text='%.10g'.__mod__):
+    # Writes (sweep_id, rows) entries in the CSV layout: "id,count" then the rows.
+    with open(file_path, 'w', newline='') as csvfile:
+        filewriter = csv.writer(csvfile, lineterminator='\n')
+        for sweep_id, rows in entries:
+            filewriter.writerow([sweep_id, len(rows)])
+            filewriter.writerows([[to_text(value) for value in row] for row in rows])
+
+def archive_to_csv(archive_path, file_path_lidar, file_path_flight_path):
+    # Converts a flight archive back to the CSV layout (LIDARPoints.csv and FlightPath.csv).
+    archive = FlightArchive(archive_path)
+    sweeps = list(archive.read_all())
+    _write_rows(file_path_lidar, [(sweep_id, polar) for sweep_id, _, polar in sweeps if polar is not None])
+    # Drone positions are stored as they are, so write them with full precision.
+    _write_rows(file_path_flight_path, [(sweep_id, position[None]) for sweep_id, position, _ in sweeps
+                                        if position is not None], lambda value: repr(float(value)))
+
+if __name__ == '__main__':
+    import tempfile
+    from .loader import SweepDict
+
+    flight_path = os.path.join("data", "FlightPath.csv")
+    lidar_path = os.path.join("data", "LIDARPoints.csv")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # The sample flight, and a larger one made of the sample sweeps repeated.
+        sample = SweepDict(lidar_path, flight_path)
+        large_lidar_path = os.path.join(temp_dir, "LargeLIDARPoints.csv")
+        large_flight_path = os.path.join(temp_dir, "LargeFlightPath.csv")
+        sweeps = list(sample.items())
+        _write_rows(large_lidar_path, [(i, sweeps[i % len(sweeps)][1].lidar_polar) for i in range(3000)])
+        _write_rows(large_flight_path, [(i, sweeps[i % len(sweeps)][1].drone_position[None]) for i in range(3000)])
+
+        for name, lidar_csv, flight_csv in (("sample flight", lidar_path, flight_path),
+                                            ("3000 sweep flight", large_lidar_path, large_flight_path)):
+            sweep_dict = SweepDict(lidar_csv, flight_csv, last_id=float('inf'))
+            archive_path = os.path.join(temp_dir, "flight.lidarz")
+            points = len(sweep_dict.get_all_lidar_polar())
+            start = time.perf_counter()
+            write_flight_archive(sweep_dict, archive_path)
+            encode = time.perf_counter() - start
+            archive = FlightArchive(archive_path)
+            start = time.perf_counter()
+            for _ in archive.read_all():
+                pass
+            decode = time.perf_counter() - start
+            sweep_id = archive.sweep_ids[len(archive) // 2]
+            start = time.perf_counter()
+            archive.read_lidar_polar(sweep_id)
+            single = time.perf_counter() - start
+
+            csv_size = os.path.getsize(lidar_csv) + os.path.getsize(flight_csv)
+            archive_size = os.path.getsize(archive_path)
+            print("%s (%d points): CSV %d bytes (%.1f bytes/point), archive %d bytes (%.2f bytes/point), "
+                  "%.1fx smaller" % (name, points, csv_size, csv_size / points, archive_size,
+                                     archive_size / points, csv_size / archive_size))
+            print("    encode %.2f M points/s, decode %.2f M points/s, one sweep decoded in %.3f ms"
+                  % (points / encode / 1e6, points / decode / 1e6, single * 1000))
@@ -0,0 +1,344 @@
+# Regular Modules
+import numpy as np
+from scipy import ndimage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import dijkstra
+import time
+import os
+
+# Custom Modules
+from .loader import Sweep, SweepDict
+
+UNKNOWN = 0
+FREE = 1
+OCCUPIED = 2
+
+class FrontierMap():
+    '''
+    Occupancy grid with square cells of side resolution that is updated one Sweep
+    at a time. The cells each beam passes through become FREE and the cell it ends
+    in becomes OCCUPIED (beams with distance 0 gave no return and are skipped).
+    Frontier cells are FREE cells next to an UNKNOWN cell, the border between
+    explored and unexplored space. After a sweep only the frontier inside the
+    bounding box of the cells it touched is recomputed, so an update costs the
+    same however large the map has grown. Frontier clusters are kept up to date
+    the same way: only clusters touching that box are labelled again. The grid
+    grows when a sweep reaches outside it.
+    '''
+    def __init__(self, resolution=0.05, max_range=None, margin=2.0):
+        assert resolution > 0, "Expected resolution to be positive"
+        self._resolution = resolution
+        self._max_range = max_range
+        self._margin = int(np.ceil(margin / resolution)) # Extra cells added when growing.
+        self._origin = None
+        self._state = np.zeros((0, 0), dtype=np.uint8)
+        self._frontier = np.zeros((0, 0), dtype=bool)
+        self._labels = np.zeros((0, 0), dtype=np.int64) # Cluster label of every frontier cell, 0 elsewhere.
+        self._clusters = dict() # Cells (K, 2) of every cluster by label.
+        self._next_label = 1
+        self._updated = None
+        self._explored = None # World bounding box (low, high) of every sweep so far.
+
+    @property
+    def resolution(self):
+        return self._resolution
+
+    @property
+    def origin(self):
+        # World coordinates of the lower corner of cell (0, 0).
+        return self._origin
+
+    @property
+    def state(self):
+        # Cell states (UNKNOWN, FREE or OCCUPIED) indexed [ix, iy].
+        return self._state
+
+    @property
+    def frontier(self):
+        # Bool grid, True for frontier cells.
+        return self._frontier
+
+    @property
+    def updated_region(self):
+        # (low, high) cell indices (inclusive) of the region the last sweep updated.
+        return self._updated
+
+    def to_cells(self, points):
+        # Cell indices (N, 2) of world points (N, 2).
+        return np.floor((np.asarray(points, dtype=float) - self._origin) / self._resolution).astype(int)
+
+    def to_world(self, cells):
+        # World coordinates (N, 2) of the centres of cells (N, 2).
+        return self._origin + (np.asarray(cells) + 0.5) * self._resolution
+
+    def _grow(self, low, high):
+        # Grows the grid so the world box low..high (2,) fits inside it.
+        if self._origin is None:
+            self._origin = np.floor(low / self._resolution) * self._resolution - self._margin * self._resolution
+            shape = np.floor((high - self._origin) / self._resolution).astype(int) + 1 + self._margin
+            self._state = np.zeros(shape, dtype=np.uint8)
+            self._frontier = np.zeros(shape, dtype=bool)
+            self._labels = np.zeros(shape, dtype=np.int64)
+            return
+        low_cells = np.floor((low - self._origin) / self._resolution).astype(int)
+        high_cells = np.floor((high - self._origin) / self._resolution).astype(int)
+        before = np.where(low_cells < 0, self._margin - low_cells, 0)
+        after = np.where(high_cells >= self._state.shape, high_cells - self._state.shape + 1 + self._margin, 0)
+        if before.any() or after.any():
+            padding = list(zip(before, after))
+            self._state = np.pad(self._state, padding)
+            self._frontier = np.pad(self._frontier, padding)
+            self._labels = np.pad(self._labels, padding)
+            self._clusters = {label: cells + before for label, cells in self._clusters.items()}
+            self._origin = self._origin - before * self._resolution
+
+    def add_sweep(self, sweep):
+        '''Adds one Sweep (with drone_position and lidar_polar) to the grid and
+        updates the frontier around it. Beams removed by the mask of the sweep are skipped.'''
+        if sweep.drone_position is None or sweep.lidar_polar is None:
+            return
+        angles, distances = sweep.masked("lidar_polar").T
+        distances = distances / 1000
+        hit = distances > 0
+        if self._max_range is not None:
+            hit &= distances <= self._max_range
+        angles, distances = np.radians(angles[hit]), distances[hit]
+        position = sweep.drone_position
+        ends = position + distances[:, None] * np.stack([np.cos(angles), -np.sin(angles)], axis=1)
+        reached = np.concatenate([ends, position[None]])
+        low, high = reached.min(axis=0), reached.max(axis=0)
+        self._grow(low, high)
+        if self._explored is None:
+            self._explored = (low, high)
+        else:
+            self._explored = (np.minimum(self._explored[0], low), np.maximum(self._explored[1], high))
+
+        # Sample every beam at half a cell, all beams at once, in cell units.
+        start = (position - self._origin) / self._resolution
+        offsets = (ends - position) / self._resolution
+        steps = np.ceil(distances / (self._resolution / 2)).astype(int)
+        owner = np.repeat(np.arange(len(steps)), steps)
+        fractions = (np.arange(len(owner)) - np.repeat(np.cumsum(steps) - steps, steps)) / steps[owner]
+        free_cells = np.floor(start + fractions[:, None] * offsets[owner]).astype(int)
+        free_cells = np.concatenate([free_cells, np.floor(start)[None].astype(int)])
+        occupied_cells = self.to_cells(ends)
+
+        free_ix, free_iy = free_cells.T
+        # Walls seen once stay walls, beams only clear unknown cells (UNKNOWN < FREE < OCCUPIED).
+        self._state[free_ix, free_iy] = np.maximum(self._state[free_ix, free_iy], FREE)
+        self._state[tuple(occupied_cells.T)] = OCCUPIED
+
+        # Every touched cell lies in the bounding box of the beam ends and the drone.
+        self._update_frontier(*self.to_cells(np.stack([low, high])))
+
+    def _update_frontier(self, low, high):
+        # Recomputes the frontier of cells low..high (inclusive) and their neighbours.
+        shape = np.array(self._state.shape)
+        low = np.maximum(low - 1, 0)
+        high = np.minimum(high + 1, shape - 1)
+        self._updated = (low, high)
+        # One more cell on every side to look at the neighbours, outside the grid is unknown.
+        outer_low = np.maximum(low - 1, 0)
+        outer_high = np.minimum(high + 1, shape - 1)
+        region = np.pad(self._state[outer_low[0]:outer_high[0] + 1, outer_low[1]:outer_high[1] + 1],
+                        list(zip(outer_low - (low - 1), (high + 1) - outer_high)), constant_values=UNKNOWN)
+        self._frontier[low[0]:high[0] + 1, low[1]:high[1] + 1] = _frontier_of(region)
+        self._update_clusters(low, high)
+
+    def _update_clusters(self, low, high):
+        '''Labels the frontier clusters again after the frontier of cells low..high
+        (inclusive) changed. Only clusters with a cell in that region or next to it
+        can have grown, merged or split; they are labelled again together with the
+        new frontier cells, inside the box around all of them.'''
+        shape = np.array(self._state.shape)
+        low = np.maximum(low - 1, 0)
+        high = np.minimum(high + 1, shape - 1)
+        region = (slice(low[0], high[0] + 1), slice(low[1], high[1] + 1))
+        region_labels = self._labels[region]
+        affected = np.unique(region_labels[region_labels > 0])
+        affected_cells = [self._clusters.pop(label) for label in affected]
+        box_low, box_high = low, high
+        if affected_cells:
+            old_cells = np.concatenate(affected_cells)
+            box_low = np.minimum(box_low, old_cells.min(axis=0))
+            box_high = np.maximum(box_high, old_cells.max(axis=0))
+            self._labels[tuple(old_cells.T)] = 0
+        box = (slice(box_low[0], box_high[0] + 1), slice(box_low[1], box_high[1] + 1))
+        # Other clusters in the box do not touch the region, so they stay out of the mask.
+        mask = np.zeros(box_high - box_low + 1, dtype=bool)
+        mask[low[0] - box_low[0]:high[0] - box_low[0] + 1, low[1] - box_low[1]:high[1] - box_low[1] + 1] = True
+        if affected_cells:
+            mask[tuple((old_cells - box_low).T)] = True
+        mask &= self._frontier[box]
+        labels, count = ndimage.label(mask, structure=np.ones((3, 3), dtype=bool))
+        if count == 0:
+            return
+        cells = np.argwhere(labels)
+        labelled = labels[tuple(cells.T)] - 1
+        self._labels[box][tuple(cells.T)] = labelled + self._next_label
+        order = np.argsort(labelled, kind='stable')
+        groups = np.split(cells[order] + box_low, np.cumsum(np.bincount(labelled, minlength=count))[:-1])
+        for offset, group in enumerate(groups):
+            self._clusters[self._next_label + offset] = group
+        self._next_label += count
+
+    def add_sweep_dict(self, sweep_dict):
+        # Adds every sweep of sweep_dict in order.
+        for sweep in sweep_dict.values():
+            self.add_sweep(sweep)
+
+    def clusters(self, min_size=1):
+        '''Frontier cells touching each other (also diagonally) grouped into clusters,
+        as kept up to date by the sweep updates.
+        Output: list of np.arrays (K, 2) of cell indices, one per cluster of at least min_size cells.'''
+        return [cells for cells in self._clusters.values() if len(cells) >= min_size]
+
+    def path_costs(self, position, limit=np.inf):
+        '''Shortest path length (metres) from position through FREE cells to every
+        cell, 8-connected without cutting corners of non free cells. Only the box
+        around the explored part of the grid is searched, as no FREE cell lies outside
+        it, and with a finite limit (metres) only the part of it within limit of
+        position, where Dijkstra stops at limit.
+        Output: (costs, low) where costs[i, j] is the cost of cell low + (i, j),
+        np.inf where unreachable or further than limit.'''
+        assert self._explored is not None, "Expected at least one sweep to be added"
+        low = np.maximum(self.to_cells(self._explored[0][None])[0], 0)
+        high = np.minimum(self.to_cells(self._explored[1][None])[0], np.array(self._state.shape) - 1)
+        if np.isfinite(limit):
+            # A path no longer than limit stays within limit of position.
+            centre = self.to_cells(np.asarray(position)[None])[0]
+            reach = int(np.ceil(limit / self._resolution)) + 1
+            low, high = np.maximum(low, centre - reach), np.minimum(high, centre + reach)
+        free = self._state[low[0]:high[0] + 1, low[1]:high[1] + 1] == FREE
+        shape = free.shape
+        ids = np.arange(free.size).reshape(shape)
+        rows, cols, weights = [], [], []
+        diagonal = np.sqrt(2) * self._resolution
+        for dx, dy, weight in ((1, 0, self._resolution), (0, 1, self._resolution),
+                               (1, 1, diagonal), (1, -1, diagonal)):
+            a = (slice(0, shape[0] - dx), slice(max(-dy, 0), shape[1] - max(dy, 0)))
+            b = (slice(dx, shape[0]), slice(max(dy, 0), shape[1] - max(-dy, 0)))
+            allowed = free[a] & free[b]
+            if dx and dy:
+                # Both cells beside a diagonal step must be free as well.
+                allowed &= free[a[0], b[1]] & free[b[0], a[1]]
+            rows.append(ids[a][allowed])
+            cols.append(ids[b][allowed])
+            weights.append(np.full(np.count_nonzero(allowed), weight))
+        graph = coo_matrix((np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+                           shape=(free.size, free.size)).tocsr()
+        start = self.to_cells(np.asarray(position)[None])[0] - low
+        assert ((start >= 0) & (start < shape)).all(), "Expected position inside the explored part of the grid"
+        return dijkstra(graph, directed=False, indices=ids[tuple(start)], limit=limit).reshape(shape), low
+
+    def rank_frontiers(self, position, min_size=3, count=None):
+        '''Frontier clusters ranked by path cost from position, nearest first.
+        Unreachable clusters are left out. With count, only the count cheapest
+        clusters are returned, and the search stops once they are found.
+        Output: list of dicts with "goal" (the cheapest cell of the cluster to
+        reach, world coordinates), "cost" (metres), "centroid" (world coordinates)
+        and "size" (number of cells).'''
+        clusters = self.clusters(min_size) if self._explored is not None else []
+        if not clusters:
+            return []
+        needed = len(clusters) if count is None else min(count, len(clusters))
+        position = np.asarray(position, dtype=float)
+        # The straight line distance to a cluster is a lower bound of its path cost, so
+        # start the search a bit beyond the needed clusters and widen it until they are reached.
+        straight = np.sort([np.linalg.norm(self.to_world(cells) - position, axis=1).min() for cells in clusters])
+        span = np.linalg.norm(np.maximum(np.abs(self._explored[0] - position), np.abs(self._explored[1] - position)))
+        limit = 2 * straight[needed - 1] + 2 * self._resolution
+        while True:
+            if limit >= span:
+                limit = np.inf
+            costs, low = self.path_costs(position, limit)
+            ranked = []
+            for cells in clusters:
+                local = cells - low
+                inside = ((local >= 0) & (local < costs.shape)).all(axis=1)
+                if not inside.any():
+                    continue
+                cell_costs = costs[local[inside, 0], local[inside, 1]]
+                nearest = np.argmin(cell_costs)
+                if np.isinf(cell_costs[nearest]):
+                    continue
+                ranked.append({"goal": self.to_world(cells[inside][nearest]), "cost": float(cell_costs[nearest]),
+                               "centroid": self.to_world(cells).mean(axis=0), "size": len(cells)})
+            # Every cost up to limit is exact, so the clusters found are the cheapest ones.
+            if len(ranked) >= needed or np.isinf(limit):
+                return sorted(ranked, key=lambda frontier: frontier["cost"])[:count]
+            limit *= 2
+
+def _frontier_of(region):
+    # Frontier of the inner cells of region, a state grid with one extra cell on every side.
+    unknown = region == UNKNOWN
+    next_to_unknown = unknown[:-2, 1:-1] | unknown[2:, 1:-1] | unknown[1:-1, :-2] | unknown[1:-1, 2:]
+    return (region[1:-1, 1:-1] == FREE) & next_to_unknown
+
+def full_frontier(state):
+    # Frontier of a whole grid at once, for comparison with FrontierMap's updates.
+    return _frontier_of(np.pad(state, 1, constant_values=UNKNOWN))
+
+if __name__ == '__main__':
+    flight_path = os.path.join("data", "FlightPath.csv")
+    lidar_path = os.path.join("data", "LIDARPoints.csv")
+    sweep_dict = SweepDict(lidar_path, flight_path)
+
+    frontier_map = FrontierMap(resolution=0.05)
+    update_times, next_times, rank_times = [], [], []
+    for sweep_id, sweep in sweep_dict.items():
+        start = time.perf_counter()
+        frontier_map.add_sweep(sweep)
+        update_times.append(time.perf_counter() - start)
+        if sweep.drone_position is None:
+            continue
+        start = time.perf_counter()
+        next_goal = frontier_map.rank_frontiers(sweep.drone_position, count=1)
+        next_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        ranked = frontier_map.rank_frontiers(sweep.drone_position)
+        rank_times.append(time.perf_counter() - start)
+        assert not ranked or np.isclose(next_goal[0]["cost"], ranked[0]["cost"])
+    assert (frontier_map.frontier == full_frontier(frontier_map.state)).all()
+    print("Sample flight, %d sweeps, grid %s at %.2f m: update %.2f ms/sweep, next goal %.2f ms/sweep, "
+          "ranking all %d frontiers %.2f ms/sweep"
+          % (len(sweep_dict), frontier_map.state.shape, frontier_map.resolution, np.mean(update_times) * 1000,
+             np.mean(next_times) * 1000, len(ranked), np.mean(rank_times) * 1000))
+    for frontier in ranked[:5]:
+        print("    frontier of %d cells, goal (%.2f, %.2f), path cost %.2f m"
+              % (frontier["size"], frontier["goal"][0], frontier["goal"][1], frontier["cost"]))
+
+    # The same flight on a grid grown to 200 x 200 m: updates stay local, a full rescan does not.
+    big_map = FrontierMap(resolution=0.05)
+    big_map._grow(np.array([-90.0, -90.0]), np.array([110.0, 110.0]))
+    start = time.perf_counter()
+    big_map.add_sweep_dict(sweep_dict)
+    update = (time.perf_counter() - start) / len(sweep_dict)
+    start = time.perf_counter()
+    full_frontier(big_map.state)
+    rescan = time.perf_counter() - start
+    print("Grid %s: update %.2f ms/sweep, full frontier rescan %.2f ms"
+          % (big_map.state.shape, update * 1000, rescan * 1000))
+
+    # The sample flight flown again in 4 more buildings, 40 m apart: the explored area grows,
+    # the search for the next goal stays around the drone, ranking every frontier does not.
+    growing_map = FrontierMap(resolution=0.05)
+    for building in range(5):
+        next_times, rank_times = [], []
+        for sweep in sweep_dict.values():
+            if sweep.drone_position is None or sweep.lidar_polar is None:
+                continue
+            moved = Sweep()
+            moved.drone_position = sweep.drone_position + [40.0 * building, 0.0]
+            moved.lidar_polar = sweep.lidar_polar
+            moved.mask = sweep.mask
+            growing_map.add_sweep(moved)
+            start = time.perf_counter()
+            growing_map.rank_frontiers(moved.drone_position, count=1)
+            next_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            growing_map.rank_frontiers(moved.drone_position)
+            rank_times.append(time.perf_counter() - start)
+        print("Building %d, grid %s: next goal %.2f ms/sweep, ranking all %d frontiers %.2f ms/sweep"
+              % (building + 1, growing_map.state.shape, np.mean(next_times) * 1000,
+                 len(growing_map.clusters(3)), np.mean(rank_times) * 1000))
@@ -0,0 +1,414 @@
+# Regular Modules
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import dijkstra
+import time
+import os
+
+# Custom Modules
+from .loader import read_mapping_csv, SweepDict
+from .wall_index import WallIndex, to_segments
+
+def get_waypoints(walls, clearance=0.05):
+    '''Candidate bend points of shortest paths around walls (N, 4). Around every wall
+    end point, the directions of the walls meeting there split the plane into gaps.
+    A shortest path can only bend around a point through a gap wider than 180
+    degrees, so one waypoint is placed clearance metres into each such gap along
+    its bisector. Waypoints never lie on a wall. Returns np.array of shape (M, 2).'''
+    walls = to_segments(walls)
+    ends = walls.reshape(-1, 2)
+    others = walls[:, [2, 3, 0, 1]].reshape(-1, 2)
+    # Wall ends closer than rounding precision are the same corner.
+    corners, corner_ids = np.unique(np.round(ends, 6), axis=0, return_inverse=True)
+    corner_ids = corner_ids.reshape(-1)
+    directions = np.arctan2(others[:, 1] - ends[:, 1], others[:, 0] - ends[:, 0])
+
+    order = np.lexsort((directions, corner_ids))
+    corner_ids, directions = corner_ids[order], directions[order]
+    # Angle to the next wall around the same corner (wrapping to the first one).
+    group_start = np.r_[True, corner_ids[1:] != corner_ids[:-1]]
+    group_first = np.maximum.accumulate(np.where(group_start, np.arange(len(order)), 0))
+    is_last = np.r_[corner_ids[1:] != corner_ids[:-1], True]
+    next_direction = np.where(is_last, directions[group_first] + 2 * np.pi, np.roll(directions, -1))
+    gaps = next_direction - directions
+
+    convex = gaps > np.pi + 1e-6
+    bisectors = directions[convex] + gaps[convex] / 2
+    offsets = clearance * np.stack([np.cos(bisectors), np.sin(bisectors)], axis=1)
+    return corners[corner_ids[convex]] + offsets
+
+def visible(wall_index, points_a, points_b, chunk_size=200000):
+    '''Line of sight between rows of points_a (N, 2) and points_b (N, 2), in chunks
+    to bound memory. Touching a wall blocks the view.'''
+    result = np.empty(len(points_a), dtype=bool)
+    for start in range(0, len(points_a), chunk_size):
+        stop = start + chunk_size
+        result[start:stop] = wall_index.line_of_sight(points_a[start:stop], points_b[start:stop], touching=True)
+    return result
+
+def visible_edges(wall_index, points, groups=None):
+    '''Returns (i, j, lengths, group_ids) for every pair of points (N, 2) that see
+    each other. If groups is given (list of index arrays) only pairs within the same
+    group are considered and group_ids tells which group, otherwise all pairs.'''
+    if groups is None:
+        groups = [np.arange(len(points))]
+    pairs_i, pairs_j, group_ids = [], [], []
+    for group_id, group in enumerate(groups):
+        i, j = np.triu_indices(len(group), k=1)
+        pairs_i.append(group[i])
+        pairs_j.append(group[j])
+        group_ids.append(np.full(len(i), group_id))
+    i = np.concatenate(pairs_i).astype(int)
+    j = np.concatenate(pairs_j).astype(int)
+    group_ids = np.concatenate(group_ids)
+    seen = visible(wall_index, points[i], points[j])
+    i, j = i[seen], j[seen]
+    return i, j, np.linalg.norm(points[i] - points[j], axis=1), group_ids[seen]
+
+def _shortest_paths(count, i, j, weights, sources):
+    # Dijkstra on the undirected graph given by edges (i, j, weights) from each source.
+    graph = coo_matrix((weights, (i, j)), shape=(count, count)).tocsr()
+    return dijkstra(graph, directed=False, indices=sources, return_predecessors=True)
+
+def _trace(predecessors, source, target):
+    # Node indices from source to target following a Dijkstra predecessor row.
+    nodes = [target]
+    while nodes[-1] != source:
+        nodes.append(predecessors[nodes[-1]])
+    return nodes[::-1]
+
+def path_length(path):
+    # Total length of a path given as np.array (N, 2).
+    return np.linalg.norm(np.diff(path, axis=0), axis=1).sum()
+
+def smooth_path(path, wall_index):
+    '''Removes detours from path (N, 2) by jumping from each point to the furthest
+    later point it can see.'''
+    smoothed = [0]
+    while smoothed[-1] < len(path) - 1:
+        current = smoothed[-1]
+        later = np.arange(current + 1, len(path))
+        seen = visible(wall_index, np.repeat(path[current][None], len(later), axis=0), path[later])
+        smoothed.append(later[seen].max() if seen.any() else current + 1)
+    return path[smoothed]
+
+class FlatPlanner():
+    '''
+    Visibility graph over all waypoints of the walls (see get_waypoints), with
+    line of sight from a WallIndex. This is the single graph approach of
+    get_shortest_path without pyvisgraph's polygon requirements, and the
+    reference the hierarchical planner is measured against.
+    '''
+    def __init__(self, walls, clearance=0.05):
+        self._wall_index = WallIndex(walls)
+        self._points = get_waypoints(walls, clearance)
+        self._edges = visible_edges(self._wall_index, self._points)[:3]
+
+    @property
+    def edge_count(self):
+        return len(self._edges[0])
+
+    def shortest_path(self, start_point, end_point):
+        '''Returns shortest path from start_point to end_point as np.array (N, 2),
+        or None if end_point can not be reached.'''
+        count = len(self._points)
+        points = np.concatenate([self._points, [start_point, end_point]], axis=0)
+        # Connect start (count) and end (count + 1) to every node they see.
+        others = np.repeat(np.arange(count + 2)[None], 2, axis=0)
+        ends = np.repeat([[count], [count + 1]], count + 2, axis=1)
+        seen = visible(self._wall_index, points[ends.reshape(-1)], points[others.reshape(-1)])
+        seen &= ends.reshape(-1) != others.reshape(-1)
+        i = np.concatenate([self._edges[0], ends.reshape(-1)[seen]])
+        j = np.concatenate([self._edges[1], others.reshape(-1)[seen]])
+        weights = np.concatenate([self._edges[2], np.linalg.norm(points[i[self.edge_count:]] -
+                                                                 points[j[self.edge_count:]], axis=1)])
+        distances, predecessors = _shortest_paths(count + 2, i, j, np.maximum(weights, 1e-12), count)
+        if not np.isfinite(distances[count + 1]):
+            return None
+        return points[_trace(predecessors, count, count + 1)]
+
+class HierarchicalPlanner():
+    '''
+    Hierarchical path planning (HPA*) for large maps. The map is cut into square
+    tiles of side tile_size. Every border between two tiles gets portal points in
+    each stretch not blocked by walls, about portal_spacing metres apart. Each
+    tile builds a small visibility graph over the waypoints inside it and the
+    portals on its border, and the shortest distances between its portals are
+    precomputed. Those distances form the abstract graph,
+    whose size grows with the number of tiles rather than with the number of
+    waypoints squared. A query connects start and end to the portals of their
+    tiles, searches the abstract graph, then expands each abstract edge into the
+    precomputed local path of its tile and finally shortcuts the result with
+    line of sight checks.
+    '''
+    def __init__(self, walls, tile_size=10.0, portal_spacing=None, clearance=0.05):
+        walls = to_segments(walls)
+        self._wall_index = WallIndex(walls)
+        self._tile_size = tile_size
+        if portal_spacing is None:
+            portal_spacing = tile_size / 4
+        waypoints = get_waypoints(walls, clearance)
+        corners = walls.reshape(-1, 2)
+        self._origin = corners.min(axis=0) - 2 * clearance
+        self._shape = np.floor((corners.max(axis=0) + 2 * clearance - self._origin) / tile_size).astype(int) + 1
+
+        portals, portal_tiles = self._make_portals(portal_spacing)
+        self._portal_count = len(portals)
+        # Portals first, then waypoints, in one point array.
+        self._points = np.concatenate([portals, waypoints], axis=0)
+        waypoint_tiles = self.tile_of(waypoints)
+        tile_count = self._shape.prod()
+        members = [[] for _ in range(tile_count)]
+        for portal, tiles in enumerate(portal_tiles):
+            for tile in tiles:
+                members[tile].append(portal)
+        for waypoint, tile in enumerate(waypoint_tiles):
+            members[tile].append(waypoint + self._portal_count)
+        self._members = [np.array(member, dtype=int) for member in members]
+
+        # Local visibility graphs of all tiles, found in one batched query.
+        i, j, lengths, tile_of_edge = visible_edges(self._wall_index, self._points, self._members)
+        order = np.argsort(tile_of_edge, kind='stable')
+        boundaries = np.searchsorted(tile_of_edge[order], np.arange(tile_count + 1))
+        self._local_edges = []
+        self._portal_paths = []
+        abstract = []
+        for tile in range(tile_count):
+            members = self._members[tile]
+            selected = order[boundaries[tile]:boundaries[tile + 1]]
+            local_i = np.searchsorted(members, i[selected])
+            local_j = np.searchsorted(members, j[selected])
+            self._local_edges.append((local_i, local_j, lengths[selected]))
+            tile_portals = np.nonzero(members < self._portal_count)[0]
+            if len(tile_portals) == 0:
+                self._portal_paths.append(None)
+                continue
+            distances, predecessors = _shortest_paths(len(members), local_i, local_j,
+                                                      np.maximum(lengths[selected], 1e-12), tile_portals)
+            self._portal_paths.append((tile_portals, predecessors))
+            a, b = np.triu_indices(len(tile_portals), k=1)
+            reachable = np.isfinite(distances[a, tile_portals[b]])
+            a, b = a[reachable], b[reachable]
+            abstract.append((members[tile_portals[a]], members[tile_portals[b]],
+                             distances[a, tile_portals[b]], np.full(len(a), tile)))
+        self._abstract = [np.concatenate(column) for column in zip(*abstract)] if abstract else \
+            [np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0), np.empty(0, dtype=int)]
+        # Keep the cheapest tile for portal pairs shared by two tiles.
+        order = np.argsort(self._abstract[2], kind='stable')
+        keys = self._abstract[0][order] * self._portal_count + self._abstract[1][order]
+        _, first = np.unique(keys, return_index=True)
+        self._abstract = [column[order[first]] for column in self._abstract]
+        self._abstract_lookup = {(a, b): index for index, (a, b)
+                                 in enumerate(zip(self._abstract[0].tolist(), self._abstract[1].tolist()))}
+
+    @property
+    def tile_count(self):
+        return int(self._shape.prod())
+
+    @property
+    def abstract_edge_count(self):
+        return len(self._abstract[0])
+
+    @property
+    def local_edge_count(self):
+        return sum(len(edges[0]) for edges in self._local_edges)
+
+    def tile_of(self, points):
+        # Flat tile index of each point (N, 2).
+        cells = np.floor((points - self._origin) / self._tile_size).astype(int)
+        cells = np.clip(cells, 0, self._shape - 1)
+        return cells[:, 0] * self._shape[1] + cells[:, 1]
+
+    def _make_portals(self, spacing):
+        '''Portal points on every border between two tiles, with the two tiles they
+        join. Like the entrances of HPA*, the walls crossing or lying on a border
+        split it into free intervals, and every interval gets at least one portal
+        (at its middle), or evenly spread portals about spacing apart if it is longer.'''
+        nx, ny = self._shape
+        size = self._tile_size
+        borders, axes, tiles = [], [], []
+        for x in range(nx):
+            for y in range(ny):
+                corner = self._origin + np.array([x, y]) * size
+                if x + 1 < nx: # Border with the tile to the right, along y.
+                    borders.append([corner[0] + size, corner[1], corner[0] + size, corner[1] + size])
+                    axes.append(1)
+                    tiles.append((x * ny + y, (x + 1) * ny + y))
+                if y + 1 < ny: # Border with the tile above, along x.
+                    borders.append([corner[0], corner[1] + size, corner[0] + size, corner[1] + size])
+                    axes.append(0)
+                    tiles.append((x * ny + y, x * ny + y + 1))
+        if not borders:
+            return np.empty((0, 2)), []
+        borders, axes = np.array(borders), np.array(axes)
+
+        # Part of each border blocked by each wall touching it, as (low, high) along the border.
+        border_ids, wall_ids = self._wall_index.intersecting_walls(borders, touching=True)
+        walls = self._wall_index.walls[wall_ids].reshape(-1, 2, 2)
+        along, across = axes[border_ids], 1 - axes[border_ids]
+        rows = np.arange(len(wall_ids))
+        line = borders[border_ids, across] # Coordinate of the border line across it.
+        start, end = walls[rows, 0], walls[rows, 1]
+        delta = end[rows, across] - start[rows, across]
+        collinear = np.abs(delta) < 1e-12
+        t = np.clip((line - start[rows, across]) / np.where(collinear, 1, delta), 0, 1)
+        crossing = start[rows, along] + t * (end[rows, along] - start[rows, along])
+        low = np.where(collinear, np.minimum(start[rows, along], end[rows, along]), crossing)
+        high = np.where(collinear, np.maximum(start[rows, along], end[rows, along]), crossing)
+        splits = np.searchsorted(border_ids, np.arange(1, len(borders)))
+
+        portals, portal_tiles = [], []
+        for border, axis, pair, block_low, block_high in zip(borders, axes, tiles, np.split(low, splits),
+                                                              np.split(high, splits)):
+            begin = border[axis]
+            order = np.argsort(block_low)
+            # Free intervals between the blocked parts, overlapping blocked parts are merged.
+            for free_low, free_high in zip(np.maximum.accumulate(np.r_[begin, block_high[order]]),
+                                           np.r_[block_low[order], begin + size]):
+                length = free_high - free_low
+                if length <= 1e-9:
+                    continue
+                count = max(1, int(round(length / spacing)))
+                steps = free_low + (np.arange(count) + 0.5) * length / count
+                points = np.repeat(border[None, :2], count, axis=0)
+                points[:, axis] = steps
+                portals.append(points)
+                portal_tiles += [pair] * count
+        if not portals:
+            return np.empty((0, 2)), []
+        return np.concatenate(portals, axis=0), portal_tiles
+
+    def _connect(self, point, tile):
+        '''Dijkstra from point through the local graph of tile. Returns (members,
+        distances, predecessors) where index len(members) is point itself.'''
+        members = self._members[tile]
+        count = len(members)
+        seen = visible(self._wall_index, np.repeat(np.asarray(point, dtype=float)[None], count, axis=0),
+                       self._points[members])
+        local_i, local_j, lengths = self._local_edges[tile]
+        new_j = np.nonzero(seen)[0]
+        i = np.concatenate([local_i, np.full(len(new_j), count)])
+        j = np.concatenate([local_j, new_j])
+        weights = np.concatenate([lengths, np.linalg.norm(self._points[members[new_j]] - point, axis=1)])
+        distances, predecessors = _shortest_paths(count + 1, i, j, np.maximum(weights, 1e-12), count)
+        return members, distances, predecessors
+
+    def _local_path(self, tile, portal, target):
+        # Global node indices of the precomputed path from portal to target inside tile.
+        members = self._members[tile]
+        tile_portals, predecessors = self._portal_paths[tile]
+        source = np.searchsorted(members, portal)
+        row = np.searchsorted(tile_portals, source)
+        return members[_trace(predecessors[row], source, np.searchsorted(members, target))]
+
+    def shortest_path(self, start_point, end_point, smooth=True):
+        '''Returns a path from start_point to end_point as np.array (N, 2), or None
+        if end_point can not be reached.'''
+        start_point = np.asarray(start_point, dtype=float)
+        end_point = np.asarray(end_point, dtype=float)
+        start_tile, end_tile = self.tile_of(np.array([start_point, end_point]))
+        start_members, start_distances, start_predecessors = self._connect(start_point, start_tile)
+        end_members, end_distances, end_predecessors = self._connect(end_point, end_tile)
+
+        # Abstract graph: portals, plus start (P) and end (P + 1).
+        source, sink = self._portal_count, self._portal_count + 1
+        start_portals = np.nonzero((start_members < source) & np.isfinite(start_distances[:-1]))[0]
+        end_portals = np.nonzero((end_members < source) & np.isfinite(end_distances[:-1]))[0]
+        i = [self._abstract[0], np.full(len(start_portals), source), end_members[end_portals]]
+        j = [self._abstract[1], start_members[start_portals], np.full(len(end_portals), sink)]
+        weights = [self._abstract[2], start_distances[start_portals], end_distances[end_portals]]
+        direct = np.inf
+        if start_tile == end_tile:
+            # End may be reachable without leaving the tile.
+            seen = visible(self._wall_index, start_point[None], end_point[None])[0]
+            through = start_distances[:-1] + end_distances[:-1]
+            direct = np.linalg.norm(end_point - start_point) if seen else through.min(initial=np.inf)
+            i.append([source])
+            j.append([sink])
+            weights.append([direct])
+        i, j, weights = np.concatenate(i), np.concatenate(j), np.concatenate(weights)
+        keep = np.isfinite(weights)
+        distances, predecessors = _shortest_paths(self._portal_count + 2, i[keep].astype(int),
+                                                  j[keep].astype(int), np.maximum(weights[keep], 1e-12), source)
+        if not np.isfinite(distances[sink]):
+            return None
+
+        abstract_path = _trace(predecessors, source, sink)
+        if len(abstract_path) == 2:
+            path = self._direct_path(start_point, end_point, start_members, start_distances,
+                                     start_predecessors, end_distances, end_predecessors)
+        else:
+            # Expand: start -> first portal, portal -> portal, last portal -> end.
+            first = np.searchsorted(start_members, abstract_path[1])
+            nodes = list(start_members[_trace(start_predecessors, len(start_members), first)[1:]])
+            for a, b in zip(abstract_path[1:-2], abstract_path[2:-1]):
+                index = self._abstract_lookup.get((min(a, b), max(a, b)))
+                local = self._local_path(self._abstract[3][index], min(a, b), max(a, b))
+                nodes += list(local[1:] if a < b else local[::-1][1:])
+            last = np.searchsorted(end_members, abstract_path[-2])
+            nodes += list(end_members[_trace(end_predecessors, len(end_members), last)[::-1][1:-1]])
+            path = np.concatenate([start_point[None], self._points[nodes], end_point[None]], axis=0)
+        return smooth_path(path, self._wall_index) if smooth else path
+
+    def _direct_path(self, start_point, end_point, members, start_distances, start_predecessors,
+                     end_distances, end_predecessors):
+        # Path between two points of the same tile that does not use any portal.
+        if visible(self._wall_index, start_point[None], end_point[None])[0]:
+            return np.array([start_point, end_point])
+        count = len(members)
+        meeting = np.argmin(start_distances[:-1] + end_distances[:-1])
+        nodes = (_trace(start_predecessors, count, meeting)[1:] +
+                 _trace(end_predecessors, count, meeting)[::-1][1:-1])
+        return np.concatenate([start_point[None], self._points[members[nodes]], end_point[None]], axis=0)
+
+def _room_grid(rooms, room_size=5.0, door=1.0):
+    '''Synthetic building: rooms x rooms square rooms with a door in the middle of
+    every inner wall. Returns walls np.array of shape (N, 4).'''
+    walls = []
+    extent = rooms * room_size
+    half = (room_size - door) / 2
+    for k in range(rooms + 1):
+        line = k * room_size
+        for r in range(rooms):
+            low = r * room_size
+            if k in (0, rooms): # Outer walls are closed.
+                walls += [[line, low, line, low + room_size], [low, line, low + room_size, line]]
+            else:
+                walls += [[line, low, line, low + half], [line, low + room_size - half, line, low + room_size],
+                          [low, line, low + half, line], [low + room_size - half, line, low + room_size, line]]
+    return np.array(walls, dtype=float), extent
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    for rooms in (4, 8, 12, 24):
+        walls, extent = _room_grid(rooms)
+        start = time.perf_counter()
+        hierarchical = HierarchicalPlanner(walls, tile_size=10.0)
+        hierarchical_build = time.perf_counter() - start
+        queries = rng.random((20, 2, 2)) * (extent - 1) + 0.5
+        start = time.perf_counter()
+        hierarchical_paths = [hierarchical.shortest_path(a, b) for a, b in queries]
+        hierarchical_query = (time.perf_counter() - start) / len(queries)
+        print("%dx%d rooms (%d walls): hierarchical build %.2f s (%d tiles, %d local + %d abstract edges), "
+              "query %.1f ms" % (rooms, rooms, len(walls), hierarchical_build, hierarchical.tile_count,
+                                 hierarchical.local_edge_count, hierarchical.abstract_edge_count,
+                                 hierarchical_query * 1000))
+        if rooms > 12:
+            continue
+        start = time.perf_counter()
+        flat = FlatPlanner(walls)
+        flat_build = time.perf_counter() - start
+        start = time.perf_counter()
+        flat_paths = [flat.shortest_path(a, b) for a, b in queries]
+        flat_query = (time.perf_counter() - start) / len(queries)
+        ratios = np.array([path_length(h) / path_length(f) for h, f in zip(hierarchical_paths, flat_paths)])
+        print("    flat build %.2f s (%d edges), query %.1f ms, hierarchical/flat path length: "
+              "mean %.3f, worst %.3f" % (flat_build, flat.edge_count, flat_query * 1000, ratios.mean(), ratios.max()))
+
+    mapping_path = os.path.join("data", "FakeMapping.csv")
+    sweep_dict = SweepDict(os.path.join("data", "LIDARPoints.csv"), os.path.join("data", "FlightPath.csv"))
+    positions = sweep_dict.get_all_drone_positions()
+    walls = read_mapping_csv(mapping_path)
+    flat_path = FlatPlanner(walls).shortest_path(positions[0], positions[-1])
+    hierarchical_path = HierarchicalPlanner(walls, tile_size=5.0).shortest_path(positions[0], positions[-1])
+    print("FakeMapping.csv: flat %.2f m, hierarchical %.2f m" % (path_length(flat_path), path_length(hierarchical_path)))
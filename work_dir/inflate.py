@@ -0,0 +1,296 @@
+'''Configuration space of a round drone.
+
+A drone of radius r fits wherever the distance to every wall is more than r, so
+the walls are inflated (Minkowski sum with a disc of radius r) and the drone can
+be planned as a point among the inflated walls. The inflation is done for all
+walls at once: the walls are rasterized, scipy's Euclidean distance transform
+gives the distance to the nearest wall in every cell, and the outlines of the
+inflated walls are the contour of that distance field at level r (contourpy).
+Inflated walls that overlap are merged by the contour on their own. The outlines
+are then simplified with Douglas-Peucker.
+'''
+# Regular Modules
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import Future
+from contourpy import contour_generator
+from scipy import ndimage
+import threading
+import hashlib
+import time
+import csv
+import os
+
+# Custom Modules
+from .loader import to_np_array
+from .wall_index import to_segments
+from .simplify import douglas_peucker
+from .hierarchical_planner import FlatPlanner, HierarchicalPlanner, path_length
+
+def polygon_edges(polygons):
+    # Edges of closed polygons (list of np.arrays (N, 2), as from to_real_polygons) as np.array (M, 4).
+    return np.concatenate([np.concatenate([polygon, np.roll(polygon, -1, axis=0)], axis=1)
+                           for polygon in polygons])
+
+class DistanceField():
+    '''
+    Distance (metres) from the centre of every cell of a grid with cells of side
+    resolution to the nearest wall of walls (N, 4). The grid covers the walls and
+    margin metres around them. Distances are exact up to one cell diagonal.
+    '''
+    def __init__(self, walls, resolution=0.05, margin=2.0):
+        walls = to_segments(walls)
+        self._resolution = resolution
+        points = walls.reshape(-1, 2)
+        self._origin = points.min(axis=0) - margin
+        shape = np.ceil((points.max(axis=0) + margin - self._origin) / resolution).astype(int) + 1
+
+        # Mark every cell a wall passes through, sampling walls at a quarter cell.
+        lengths = np.linalg.norm(walls[:, 2:] - walls[:, :2], axis=1)
+        steps = np.ceil(lengths / (resolution / 4)).astype(int) + 1
+        owner = np.repeat(np.arange(len(walls)), steps)
+        fractions = (np.arange(len(owner)) - np.repeat(np.cumsum(steps) - steps, steps)) / (steps[owner] - 1)
+        samples = walls[owner, :2] + fractions[:, None] * (walls[owner, 2:] - walls[owner, :2])
+        cells = np.floor((samples - self._origin) / resolution).astype(int)
+        free = np.ones(shape, dtype=bool)
+        free[cells[:, 0], cells[:, 1]] = False
+        self._distances = (ndimage.distance_transform_edt(free) * resolution).astype(np.float32)
+
+    @property
+    def resolution(self):
+        return self._resolution
+
+    @property
+    def distances(self):
+        # Distances indexed [ix, iy], cell (ix, iy) has its centre at origin + ((ix, iy) + 0.5) * resolution.
+        return self._distances
+
+    @property
+    def error(self):
+        # Largest difference between distances and the true distance to the walls.
+        return self._resolution * np.sqrt(2) / 2
+
+    def at(self, points):
+        # Distance field at points (M, 2), interpolated linearly between cell centres.
+        cells = (np.asarray(points, dtype=float).reshape(-1, 2) - self._origin) / self._resolution - 0.5
+        return ndimage.map_coordinates(self._distances, cells.T, order=1, mode='nearest')
+
+    def contours(self, level):
+        # Closed outlines (list of np.arrays (N, 2)) where the distance field equals level.
+        nx, ny = self._distances.shape
+        xs = self._origin[0] + (np.arange(nx) + 0.5) * self._resolution
+        ys = self._origin[1] + (np.arange(ny) + 0.5) * self._resolution
+        lines = contour_generator(xs, ys, self._distances.T).lines(level)
+        # Closed lines repeat their first point at the end.
+        return [line[:-1] for line in lines if len(line) > 3]
+
+def outline_level(field, radius, simplify=True):
+    # Distance field level of the outlines for radius, see inflate_walls.
+    return radius + field.error + (field.resolution / 2 if simplify else 0.0)
+
+def inflate_walls(walls, radius, resolution=0.05, simplify=True, field=None):
+    '''Outlines (list of np.arrays (N, 2)) of walls (N, 4) inflated by radius,
+    overlapping ones merged. The outlines are placed a little further out than
+    radius, to cover the error of the distance field and of simplifying, so the
+    drone keeps at least radius from the walls. field can be a DistanceField of
+    the walls (with margin beyond radius) to reuse for several radii.'''
+    if field is None:
+        field = DistanceField(walls, resolution, margin=radius + 4 * resolution)
+    outlines = field.contours(outline_level(field, radius, simplify))
+    if simplify and outlines:
+        kept = douglas_peucker(outlines, field.resolution / 2)
+        outlines = [outline[keep] for outline, keep in zip(outlines, kept)]
+    return outlines
+
+def inflate_polygons(polygons, radius, resolution=0.05, simplify=True):
+    # inflate_walls for polygons as from to_real_polygons (list of np.arrays (N, 2)).
+    return inflate_walls(polygon_edges(polygons), radius, resolution, simplify)
+
+def read_mapping(mapping_path):
+    '''Reads the mapping CSV at mapping_path (as read_mapping_csv) and hashes it
+    from the same bytes, so the digest always belongs to the walls returned.
+    Output: (walls, digest), walls np.array (N, 4) and digest the SHA-1 of the file.'''
+    with open(mapping_path, 'rb') as mapping_file:
+        content = mapping_file.read()
+    walls = to_np_array(list(csv.reader(content.decode().splitlines())))
+    return walls, hashlib.sha1(content).hexdigest()
+
+def walls_hash(walls):
+    # SHA-1 of walls (N, 4), for walls that did not come with a digest from read_mapping.
+    return hashlib.sha1(np.ascontiguousarray(walls, dtype=float).tobytes()).hexdigest()
+
+class InflatedMap():
+    '''
+    Walls inflated by radius together with the planner (FlatPlanner or
+    HierarchicalPlanner) built over the inflated outlines.
+    '''
+    def __init__(self, field, radius, planner=FlatPlanner, simplify=True, **planner_kwargs):
+        self._field = field
+        self._radius = radius
+        self._level = outline_level(field, radius, simplify)
+        self._outlines = inflate_walls(None, radius, simplify=simplify, field=field)
+        self._walls = polygon_edges(self._outlines) if self._outlines else np.empty((0, 4))
+        self._planner = planner(self._walls, **planner_kwargs)
+
+    @property
+    def radius(self):
+        return self._radius
+
+    @property
+    def outlines(self):
+        return self._outlines
+
+    @property
+    def walls(self):
+        # Edges of the inflated outlines, np.array (N, 4).
+        return self._walls
+
+    def is_free(self, points):
+        # True for points (M, 2) outside the inflated outlines, where the drone keeps radius from the walls.
+        return self._field.at(points) >= self._level
+
+    def shortest_path(self, start_point, end_point):
+        '''Shortest path (np.array (N, 2)) keeping radius from the walls, or None if
+        start_point or end_point is too close to a wall or end_point can not be reached.'''
+        if not self.is_free(np.array([start_point, end_point], dtype=float)).all():
+            return None
+        return self._planner.shortest_path(start_point, end_point)
+
+class InflationCache():
+    '''
+    Inflated maps by (mapping hash, radius). The distance field is computed once
+    per mapping and shared by all radii, and each radius builds its outlines and
+    planner once, so switching between drones of different sizes is a lookup.
+    The least recently used maps are dropped beyond max_maps, and a distance
+    field once no cached map uses it. planner and planner_kwargs are passed on
+    to InflatedMap.
+    The cache can be used from several threads at once. Entries are futures, so
+    threads asking for a map (or field) that is being built wait for that build
+    instead of building it again.
+    '''
+    def __init__(self, resolution=0.05, max_radius=1.0, max_maps=16, planner=FlatPlanner, **planner_kwargs):
+        self._resolution = resolution
+        self._max_radius = max_radius
+        self._max_maps = max_maps
+        self._planner = planner
+        self._planner_kwargs = planner_kwargs
+        self._lock = threading.Lock() # Guards _fields, _maps and the counters.
+        self._fields = dict()
+        self._maps = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._maps)
+
+    @property
+    def max_radius(self):
+        return self._max_radius
+
+    def get(self, walls, radius, digest=None):
+        '''InflatedMap of walls (N, 4, as from read_mapping) for radius. digest
+        identifies the walls in the cache, pass the one read_mapping returned with
+        them; without it the walls are hashed with walls_hash.'''
+        # Raised explicitly rather than asserted, radius comes from client requests.
+        if not 0 < radius <= self._max_radius:
+            raise ValueError("Expected radius in (0, %s]" % self._max_radius)
+        if digest is None:
+            digest = walls_hash(walls)
+        key = (digest, float(radius))
+        with self._lock:
+            future = self._maps.get(key)
+            build = future is None
+            if build:
+                self.misses += 1
+                future = self._maps[key] = Future()
+                if len(self._maps) > self._max_maps:
+                    self._maps.popitem(last=False)
+                    self._drop_unused_fields()
+            else:
+                self.hits += 1
+                self._maps.move_to_end(key)
+        if build:
+            self._fulfil(self._maps, key, future, lambda: InflatedMap(
+                self._field(walls, digest), radius, self._planner, **self._planner_kwargs))
+        return future.result()
+
+    def _field(self, walls, digest):
+        # DistanceField of walls with digest, computed once while any cached map uses it.
+        with self._lock:
+            future = self._fields.get(digest)
+            build = future is None
+            if build:
+                future = self._fields[digest] = Future()
+        if build:
+            self._fulfil(self._fields, digest, future, lambda: DistanceField(
+                walls, self._resolution, margin=self._max_radius + 4 * self._resolution))
+        return future.result()
+
+    def _fulfil(self, entries, key, future, build):
+        # Sets future, the entry for key in entries, to build(). A failed build is
+        # dropped from entries, so the next request for key tries again.
+        try:
+            future.set_result(build())
+        except Exception as error:
+            with self._lock:
+                if entries.get(key) is future:
+                    del entries[key]
+                    self._drop_unused_fields()
+            future.set_exception(error)
+
+    def _drop_unused_fields(self):
+        # Drops the distance fields of mappings without a cached map. Call with the lock held.
+        used = {digest for digest, radius in self._maps}
+        for digest in [digest for digest in self._fields if digest not in used]:
+            del self._fields[digest]
+
+def _clearance(path, walls, step=0.01):
+    # Smallest distance from path (N, 2), sampled every step metres, to walls (W, 4).
+    from .deskew import distance_to_walls
+    samples = [np.linspace(a, b, max(2, int(np.ceil(np.linalg.norm(b - a) / step)) + 1))
+               for a, b in zip(path[:-1], path[1:])]
+    return distance_to_walls(np.concatenate(samples), walls).min()
+
+if __name__ == '__main__':
+    from .loader import SweepDict
+    from .hierarchical_planner import _room_grid
+
+    sweep_dict = SweepDict(os.path.join("data", "LIDARPoints.csv"), os.path.join("data", "FlightPath.csv"))
+    positions = sweep_dict.get_all_drone_positions()
+    mapping_path = os.path.join("data", "FakeMapping.csv")
+    walls, digest = read_mapping(mapping_path)
+    cache = InflationCache()
+    point_path = FlatPlanner(walls).shortest_path(positions[0], positions[-1])
+    print("FakeMapping.csv, point drone: path %.2f m, clearance %.3f m"
+          % (path_length(point_path), _clearance(point_path, walls)))
+    for radius in (0.1, 0.2, 0.3, 0.1, 0.2, 0.3):
+        start = time.perf_counter()
+        inflated = cache.get(walls, radius, digest)
+        build = time.perf_counter() - start
+        path = inflated.shortest_path(positions[0], positions[-1])
+        description = "no path" if path is None else "path %.2f m, clearance %.3f m" % (
+            path_length(path), _clearance(path, walls))
+        print("    radius %.1f m: %d outline vertices, inflation and graph %.1f ms, %s"
+              % (radius, len(inflated.walls), build * 1000, description))
+
+    rng = np.random.default_rng(0)
+    for rooms in (12, 24):
+        walls, extent = _room_grid(rooms)
+        # One room per tile, inflated outlines have many more corners than the walls.
+        cache = InflationCache(planner=HierarchicalPlanner, tile_size=5.0)
+        for radius in (0.2, 0.4, 0.2, 0.4):
+            start = time.perf_counter()
+            inflated = cache.get(walls, radius)
+            build = time.perf_counter() - start
+            # Queries between points the drone fits at.
+            candidates = rng.random((200, 2)) * extent
+            free = candidates[inflated.is_free(candidates)]
+            queries = free[:40].reshape(-1, 2, 2)
+            start = time.perf_counter()
+            paths = [inflated.shortest_path(a, b) for a, b in queries]
+            query = (time.perf_counter() - start) / len(queries)
+            found = [path for path in paths if path is not None]
+            print("%dx%d rooms (%d walls), radius %.1f m: %d outline vertices, inflation and graph %.2f s, "
+                  "query %.1f ms, %d/%d paths found, clearance %.3f m"
+                  % (rooms, rooms, len(walls), radius, len(inflated.walls), build, query * 1000,
+                     len(found), len(paths), min(_clearance(path, walls) for path in found)))
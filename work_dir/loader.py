@@ -4,6 +4,11 @@ from collections import OrderedDict
 import numpy as np
 import matplotlib.pyplot as plt
 
+# Custom Modules
+from .flight_archive import FlightArchive, is_flight_archive
+from .filters import apply_filters
+from .deskew import deskew_sweeps
+
 class Sweep():
     '''
     Container object to hold information related to one sweep.
@@ -12,6 +17,7 @@ class Sweep():
         self._drone_position = None
         self._lidar_polar = None
         self._lidar_cartesian = None
+        self._mask = None
     
     def __repr__(self):
         string = "(drone_position: " + self._to_string(self._drone_position)
@@ -45,6 +51,8 @@ class Sweep():
 
     @lidar_polar.setter
     def lidar_polar(self, value):
+        # A mask belongs to the points it was made for, new points start unfiltered.
+        self._mask = None
         if value is not None:
             assert isinstance(value, np.ndarray), "Expected lidar_polar of type np.ndarray"
             assert value.dtype == float, "Expected lidar_polar to have dtype float"
@@ -67,15 +75,53 @@ class Sweep():
         else: 
             self._lidar_cartesian = None
 
+    @property
+    def mask(self):
+        # Bool np.array (N,) from filtering, True for LIDAR points to keep. None keeps all points.
+        return self._mask
+
+    @mask.setter
+    def mask(self, value):
+        if value is not None:
+            assert isinstance(value, np.ndarray), "Expected mask of type np.ndarray"
+            assert value.dtype == bool, "Expected mask to have dtype bool"
+            assert self._lidar_polar is not None and value.shape == (len(self._lidar_polar),), \
+                "Expected mask of shape (N,) matching lidar_polar"
+            self._mask = value
+        else:
+            self._mask = None
+
+    def masked(self, attribute):
+        # Returns attribute ("lidar_polar" or "lidar_cartesian") with only the points kept by mask.
+        value = getattr(self, attribute)
+        if value is None or self._mask is None:
+            return value
+        return value[self._mask]
+
 class SweepDict(OrderedDict):
     '''
     Creates an ordered dafault dict for containing Sweep objects.
+    file_path_lidar can also be a flight archive (see flight_archive.py), then
+    file_path_flight_path can be None to use the drone positions in the archive.
+    filters is an optional list of point filters (see filters.py) run over the
+    whole flight once it is loaded. With deskew each beam is converted from its
+    own interpolated drone position, see deskew.py for deskew_anchor.
     '''
-    def __init__(self, file_path_lidar, file_path_flight_path, last_id=33):
+    def __init__(self, file_path_lidar, file_path_flight_path, last_id=33, filters=None, deskew=False,
+                 deskew_anchor=0.0):
         super().__init__()
-        self._csv_reader(file_path_lidar, "lidar_polar", last_id)
-        self._csv_reader(file_path_flight_path, "drone_position", last_id)
+        self.filter_stats = []
+        if is_flight_archive(file_path_lidar):
+            self._archive_reader(file_path_lidar, file_path_flight_path is None, last_id)
+        else:
+            self._csv_reader(file_path_lidar, "lidar_polar", last_id)
+        if file_path_flight_path is not None:
+            self._csv_reader(file_path_flight_path, "drone_position", last_id)
         self._set_lidar_cartesian()
+        if deskew:
+            deskew_sweeps(self, deskew_anchor)
+        if filters:
+            self.apply_filters(filters)
     
     def __getitem__(self, key):
         # Adapts behavior of defaultdict.
@@ -105,6 +151,14 @@ class SweepDict(OrderedDict):
                     self[sweep_id].lidar_polar = data
                 index += data_size
     
+    def _archive_reader(self, file_path, with_positions, last_id):
+        # Read sweeps from a flight archive, same ids as _csv_reader would give.
+        for sweep_id, drone_position, lidar_polar in FlightArchive(file_path).read_all(last_id):
+            if lidar_polar is not None:
+                self[sweep_id].lidar_polar = lidar_polar
+            if with_positions and drone_position is not None:
+                self[sweep_id].drone_position = drone_position
+
     def _set_lidar_cartesian(self):
         # Convert one sweep of polar LIDAR points to cartesian LIDAR points.
         not_all_none = any([(sweep.lidar_polar is not None) and (sweep.drone_position is not None)
@@ -127,6 +181,14 @@ class SweepDict(OrderedDict):
             cartesian_ys = y - distances * np.sin(np.radians(angles))
             sweep.lidar_cartesian = np.concatenate((cartesian_xs, cartesian_ys), axis=1)
         
+    def apply_filters(self, point_filters):
+        '''Filters the LIDAR points of all sweeps, replacing earlier masks.
+        Returns per filter stats, also kept in filter_stats.'''
+        for sweep in self.values():
+            sweep.mask = None
+        self.filter_stats = apply_filters(self, point_filters)
+        return self.filter_stats
+
     def get_all_drone_positions(self):
         # Returns all drone positions or None if there are none.
         collected = np.ndarray((len(self.keys()), 2))
@@ -139,21 +201,22 @@ class SweepDict(OrderedDict):
             return None
         return collected[:count]
     
-    def get_all_lidar_polar(self):
-        # Returns all polar lidar points or None if there are none.
+    def get_all_lidar_polar(self, masked=True):
+        # Returns all polar lidar points or None if there are none, by default without filtered points.
         collected = []
         for sweep in self.values():
             if sweep.lidar_polar is not None:
-                collected.append(sweep.lidar_polar)
+                collected.append(sweep.masked("lidar_polar") if masked else sweep.lidar_polar)
         if not collected:
             return None
         return np.concatenate(collected, axis=0)
     
-    def get_all_lidar_cartesian(self):
+    def get_all_lidar_cartesian(self, masked=True):
+        # Returns all cartesian lidar points or None if there are none, by default without filtered points.
         collected = []
         for sweep in self.values():
             if sweep.lidar_cartesian is not None:
-                collected.append(sweep.lidar_cartesian)
+                collected.append(sweep.masked("lidar_cartesian") if masked else sweep.lidar_cartesian)
         if not collected:
             return None
         return np.concatenate(collected, axis=0)
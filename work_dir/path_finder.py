@@ -9,6 +9,7 @@ import os
 
 # Custom Modules
 from .loader import read_mapping_csv, SweepDict
+from .simplify import simplify_polygons
 
 def print_dict(wall_dict):
     # Prints dict nicely.
@@ -123,12 +124,12 @@ def back_track(point, wall_dict, ref_dict, fake_point):
         # Traversed to point with two walls, continue making paralell path.
         if len(connected_walls) == 2:
             add_wall_entry(wall_dict, prev_fake_point, fake_point)
+            # Link parallell points:
+            ref_dict[fake_point] = current_point
             
             #Update fake point with a new fake index.
             prev_fake_point = fake_point
             fake_point += 1
-            # Link parallell points:
-            ref_dict[fake_point] = current_point
             
             current_wall = select_next_wall(current_wall, connected_walls)
             # To select next point, take second point in wall (first is current_point).
@@ -179,9 +180,12 @@ def shift(current_point, next_point):
     shift = np.sign(next_point - current_point) * delta
     return current_point + shift
 
-def to_real_polygons(polygons, ref_dict, real_points):
+def to_real_polygons(polygons, ref_dict, real_points, max_deviation=None, stats=None):
     '''Converts index points in real polygon to real coordinate points
-    and shifts overlapping points by a small amount so they do not overlap.'''
+    and shifts overlapping points by a small amount so they do not overlap.
+    If max_deviation is given, vertices closer than max_deviation to the
+    outline are removed (see simplify_polygons). If stats (dict) is given,
+    stats["vertices_removed"] is set to the number of vertices removed.'''
     converted_polygons = []
     for polygon in polygons:
         poly = []
@@ -194,6 +198,9 @@ def to_real_polygons(polygons, ref_dict, real_points):
             poly.append(real_point.tolist())
         poly = np.array(poly)
         converted_polygons.append(poly)
+    converted_polygons, removed = simplify_polygons(converted_polygons, max_deviation)
+    if stats is not None:
+        stats["vertices_removed"] = removed
     return inside_out_polygon(converted_polygons)
 
 def go_right(polygon):
@@ -253,10 +260,19 @@ def plot_polygons(polygons):
         line = np.array([polygon[-1], polygon[0]])
         plt.plot(*line.T, 'b')
 
+def to_vg_polygons(polygons):
+    # Transform polygons (list of np.arrays) to types fit for pyvisgraph (vg)
+    return [[vg.Point(*point) for point in poly] for poly in polygons]
+
+def build_vg_graph(polygons, status=True):
+    # Build pyvisgraph (vg) visibility graph from polygons made of vg.Points
+    graph = vg.VisGraph()
+    graph.build(polygons, status=status)
+    return graph
+
 def get_vg_shortest_path(polygons, start_point, end_point):
     # Get shortest path from pyvisgraph (vg)
-    graph = vg.VisGraph()
-    graph.build(polygons)
+    graph = build_vg_graph(polygons)
     shortest_path = graph.shortest_path(vg.Point(*start_point), vg.Point(*end_point))
     return shortest_path
 
@@ -282,12 +298,14 @@ def store_path(path, store_path, store_id):
             filewriter.writerow([point.x, point.y])
             store_id += 1
 
-def get_shortest_path(mapping_path, storage_path, start_point, end_point, store_id):
-    '''Creates polygons making up a layout from data given by CSV file at mapping_path,
-    it further finds the shortest path from start_point to end_point. Then displays
-    shortest path as well as layout. Finally, it saves the path in at storage_path
-    with the first point having store_id, and following ids are incremented.'''
-    walls = read_mapping_csv(mapping_path)
+def load_polygons(mapping_path, max_deviation=None, stats=None):
+    '''Creates polygons (list of np.arrays of shape (N, 2)) making up a layout
+    from data given by CSV file at mapping_path. See to_real_polygons for
+    max_deviation and stats.'''
+    return walls_to_polygons(read_mapping_csv(mapping_path), max_deviation, stats)
+
+def walls_to_polygons(walls, max_deviation=None, stats=None):
+    # load_polygons for walls (N, 4) already read with read_mapping_csv.
     walls = walls.reshape(-1, 2, 2) # Split row into the two points making up a wall
 
     points = np.unique(walls.reshape(-1, 2), axis=0) # Get all points used to make walls
@@ -300,12 +318,26 @@ def get_shortest_path(mapping_path, storage_path, start_point, end_point, store_
     ref_dict = balance_dict(wall_dict) # Ref dict links fake points to their real parallel point
 
     # Transform indices back to their real coordinate
-    polygons = to_real_polygons(get_polygons(wall_dict), ref_dict, points)
+    return to_real_polygons(get_polygons(wall_dict), ref_dict, points, max_deviation, stats)
+
+def get_shortest_path(mapping_path, storage_path, start_point, end_point, store_id, max_deviation=None):
+    '''Creates polygons making up a layout from data given by CSV file at mapping_path,
+    it further finds the shortest path from start_point to end_point. Then displays
+    shortest path as well as layout. Finally, it saves the path in at storage_path
+    with the first point having store_id, and following ids are incremented.
+    See to_real_polygons for max_deviation, the number of vertices it removed
+    and the graph build time are printed.'''
+    stats = dict()
+    polygons = load_polygons(mapping_path, max_deviation, stats)
     plot_polygons(polygons)
 
     # Transform polygon to types fit for pyvisgraph
-    polygons = [[vg.Point(*point) for point in poly] for poly in polygons]
-    shortest_path = get_vg_shortest_path(polygons, start_point, end_point)
+    polygons = to_vg_polygons(polygons)
+    build_start = time.perf_counter()
+    graph = build_vg_graph(polygons)
+    print("Simplification removed %d vertices, graph of %d vertices built in %.1f ms"
+          % (stats["vertices_removed"], sum(map(len, polygons)), (time.perf_counter() - build_start) * 1000))
+    shortest_path = graph.shortest_path(vg.Point(*start_point), vg.Point(*end_point))
     plot_path(shortest_path)
     store_path(shortest_path, storage_path, store_id)
 
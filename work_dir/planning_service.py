@@ -0,0 +1,234 @@
+# Regular Modules
+import pyvisgraph as vg
+import numpy as np
+import argparse
+import asyncio
+import json
+import time
+import os
+
+# Custom Modules
+from .loader import SweepDict
+from .path_finder import walls_to_polygons, to_vg_polygons, build_vg_graph
+from .inflate import InflationCache, read_mapping
+
+class PlanningService():
+    '''
+    Long running path planner. Mappings are parsed and their visibility graphs
+    built once, then kept warm in memory and shared by every client. Clients talk
+    to the service over a TCP (localhost) or Unix socket with one JSON object per
+    line, and get one JSON object per line back:
+        {"op": "path", "map": name, "start": [x, y], "end": [x, y]}
+            -> {"ok": true, "path": [[x, y], ...], "length": float}
+            (add "radius": r to plan for a drone of radius r up to max_radius, see inflate.py)
+        {"op": "load", "map": name, "mapping_path": path}
+            -> {"ok": true, "map": name, "polygons": int, "vertices_removed": int, "build_time": float}
+            (mapping_path can be left out to reload a map from its last path, add
+            "max_deviation": d to simplify the polygons, see simplify.py)
+        {"op": "maps"} -> {"ok": true, "maps": [name, ...]}
+    Failed requests are answered with {"ok": false, "error": message}. A request
+    line longer than request_limit bytes is answered with an error and the
+    connection is closed, as the rest of the line can not be told from the next.
+    Graph builds and queries run in a thread pool so the event loop keeps serving
+    other clients, and a reload only swaps in the new graph once it is built.
+    '''
+    def __init__(self, max_radius=1.0, request_limit=2 ** 20):
+        self._request_limit = request_limit
+        self._graphs = dict()
+        self._mapping_paths = dict()
+        self._walls = dict() # (walls, digest) of every map as it was loaded, see read_mapping.
+        self._inflation = InflationCache(max_radius=max_radius)
+        self._operations = {"path": self._path, "load": self._load, "maps": self._maps}
+
+    async def load_map(self, name, mapping_path=None, max_deviation=None):
+        '''Builds the graph for the mapping at mapping_path (or the path name was
+        last loaded from) and makes it available as name. The file is read once,
+        inflated maps for radius requests are built from the same walls. See
+        load_polygons for max_deviation.'''
+        if mapping_path is None:
+            if name not in self._mapping_paths:
+                raise ValueError("Unknown map '%s' and no mapping_path given" % name)
+            mapping_path = self._mapping_paths[name]
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        stats = dict()
+        walls, digest = await loop.run_in_executor(None, read_mapping, mapping_path)
+        polygons = await loop.run_in_executor(None, walls_to_polygons, walls, max_deviation, stats)
+        graph = await loop.run_in_executor(None, build_vg_graph, to_vg_polygons(polygons), False)
+        self._graphs[name] = graph
+        self._mapping_paths[name] = mapping_path
+        self._walls[name] = (walls, digest)
+        return {"map": name, "polygons": len(polygons), "vertices_removed": stats["vertices_removed"],
+                "build_time": time.perf_counter() - start}
+
+    async def handle_request(self, request):
+        # Answers one decoded request with a response dict.
+        try:
+            # Raised explicitly rather than asserted, asserts are stripped by python -O.
+            if not isinstance(request, dict):
+                raise ValueError("Expected request to be a JSON object")
+            operation = self._operations.get(request.get("op"))
+            if operation is None:
+                raise ValueError("Unknown op '%s'" % request.get("op"))
+            response = await operation(request)
+            response["ok"] = True
+        except Exception as error:
+            response = {"ok": False, "error": str(error) or type(error).__name__}
+        return response
+
+    async def _path(self, request):
+        graph = self._graphs.get(request.get("map"))
+        if graph is None:
+            raise ValueError("Unknown map '%s'" % request.get("map"))
+        loop = asyncio.get_running_loop()
+        if request.get("radius"):
+            # Inflated maps are cached per mapping and radius.
+            walls, digest = self._walls[request["map"]]
+            inflated = await loop.run_in_executor(None, self._inflation.get, walls, float(request["radius"]), digest)
+            path = await loop.run_in_executor(None, inflated.shortest_path, request["start"], request["end"])
+            if path is None:
+                raise ValueError("No path for a drone of radius %s" % request["radius"])
+            path = path.tolist()
+        else:
+            start = vg.Point(*request["start"])
+            end = vg.Point(*request["end"])
+            path = await loop.run_in_executor(None, graph.shortest_path, start, end)
+            path = [[point.x, point.y] for point in path]
+        length = float(np.linalg.norm(np.diff(path, axis=0), axis=1).sum()) if len(path) > 1 else 0.0
+        return {"path": path, "length": length}
+
+    async def _load(self, request):
+        return await self.load_map(request.get("map"), request.get("mapping_path"), request.get("max_deviation"))
+
+    async def _maps(self, request):
+        return {"maps": sorted(self._graphs.keys())}
+
+    async def _handle_client(self, reader, writer):
+        # Serves one connection until the client closes it.
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Line longer than the stream limit (LimitOverrunError is raised as ValueError).
+                    response = {"ok": False, "error": "Request longer than %d bytes" % self._request_limit}
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    response = {"ok": False, "error": "Invalid JSON: %s" % error}
+                else:
+                    response = await self.handle_request(request)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            # Reset or broken pipe, the client went away mid-request.
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, address):
+        '''Starts listening on address, either (host, port) for TCP or a file
+        path for a Unix socket. Returns the asyncio server.'''
+        if isinstance(address, str):
+            return await asyncio.start_unix_server(self._handle_client, path=address, limit=self._request_limit)
+        host, port = address
+        return await asyncio.start_server(self._handle_client, host, port, limit=self._request_limit)
+
+async def open_connection(address):
+    # Opens (reader, writer) to a service at address, see PlanningService.start.
+    if isinstance(address, str):
+        return await asyncio.open_unix_connection(address)
+    return await asyncio.open_connection(*address)
+
+async def send_request(reader, writer, request):
+    # Sends one request on an open connection and waits for its response.
+    writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+async def run_load_test(address, map_name, queries, clients=8, requests_per_client=50):
+    '''Runs clients concurrent connections against the service at address, each
+    sending requests_per_client path requests picked in turn from queries (list of
+    (start, end) pairs). Returns dict with throughput (requests/second) and
+    latency percentiles (seconds).'''
+    latencies = []
+
+    async def client(offset):
+        reader, writer = await open_connection(address)
+        try:
+            for i in range(requests_per_client):
+                start, end = queries[(offset + i) % len(queries)]
+                request = {"op": "path", "map": map_name,
+                           "start": list(map(float, start)), "end": list(map(float, end))}
+                sent = time.perf_counter()
+                response = await send_request(reader, writer, request)
+                latencies.append(time.perf_counter() - sent)
+                assert response["ok"], response.get("error")
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(i) for i in range(clients)])
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies)
+    return {"requests": len(latencies), "throughput": len(latencies) / elapsed,
+            "p50": np.percentile(latencies, 50), "p95": np.percentile(latencies, 95),
+            "p99": np.percentile(latencies, 99), "max": latencies.max()}
+
+async def _serve(address, maps, max_radius):
+    service = PlanningService(max_radius)
+    for name, mapping_path in maps:
+        print("Loaded", await service.load_map(name, mapping_path))
+    server = await service.start(address)
+    print("Serving on", address)
+    async with server:
+        await server.serve_forever()
+
+async def _benchmark(address, maps, clients, requests_per_client, max_radius):
+    # Starts a service locally and measures it with run_load_test.
+    service = PlanningService(max_radius)
+    name, mapping_path = maps[0]
+    print("Loaded", await service.load_map(name, mapping_path))
+    server = await service.start(address)
+    if not isinstance(address, str):
+        address = server.sockets[0].getsockname()[:2]
+
+    sweep_dict = SweepDict(os.path.join("data", "LIDARPoints.csv"), os.path.join("data", "FlightPath.csv"))
+    positions = sweep_dict.get_all_drone_positions()
+    rng = np.random.default_rng(0)
+    queries = [tuple(positions[rng.choice(len(positions), 2, replace=False)]) for _ in range(100)]
+    async with server:
+        for concurrency in (1, clients):
+            result = await run_load_test(address, name, queries, concurrency, requests_per_client)
+            print("%d client(s), %d requests: %.1f requests/second, latency p50 %.1f ms, "
+                  "p95 %.1f ms, p99 %.1f ms, max %.1f ms"
+                  % (concurrency, result["requests"], result["throughput"], result["p50"] * 1000,
+                     result["p95"] * 1000, result["p99"] * 1000, result["max"] * 1000))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Path planning service with warm visibility graphs.")
+    parser.add_argument('mode', choices=['serve', 'bench'],
+                        help="serve: run the service, bench: run a local load test against it.")
+    parser.add_argument('--map', action='append', metavar='NAME=PATH', default=[],
+                        help="Mapping to load (can be repeated), default: fake=data/FakeMapping.csv.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on (0 for any free port).")
+    parser.add_argument('--unix', metavar='PATH', help="Listen on a Unix socket instead of TCP.")
+    parser.add_argument('--max-radius', type=float, default=1.0, help="Largest drone radius (metres) to plan for.")
+    parser.add_argument('--clients', type=int, default=8, help="Concurrent clients in bench mode.")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per client in bench mode.")
+    args = parser.parse_args()
+
+    maps = [tuple(entry.split('=', 1)) for entry in args.map]
+    if not maps:
+        maps = [("fake", os.path.join("data", "FakeMapping.csv"))]
+    address = args.unix if args.unix else (args.host, args.port)
+    if args.mode == 'serve':
+        asyncio.run(_serve(address, maps, args.max_radius))
+    else:
+        asyncio.run(_benchmark(address, maps, args.clients, args.requests, args.max_radius))
@@ -0,0 +1,207 @@
+# Regular Modules
+import numpy as np
+from scipy.spatial import cKDTree
+import time
+import os
+
+# Custom Modules
+from .loader import SweepDict
+
+def rotation_matrices(angles):
+    # Returns np.array of shape (N, 2, 2) with one 2D rotation matrix per angle (radians).
+    cos, sin = np.cos(angles), np.sin(angles)
+    return np.stack([np.stack([cos, -sin], axis=-1),
+                     np.stack([sin, cos], axis=-1)], axis=-2)
+
+def best_fit_rotations(covariances):
+    '''Solves the orthogonal Procrustes problem for a batch of cross covariance
+    matrices of shape (N, 2, 2) with one batched SVD. Returns rotation angles of
+    shape (N,) (no reflections).'''
+    u, _, vt = np.linalg.svd(covariances)
+    # Flip the last singular vector where the solution would be a reflection.
+    det = np.linalg.det(np.matmul(u, vt))
+    u[:, :, 1] *= np.where(det < 0, -1, 1)[:, None]
+    rotations = np.matmul(u, vt).transpose(0, 2, 1)
+    return np.arctan2(rotations[:, 1, 0], rotations[:, 0, 0])
+
+def _segment_sums(values, segments, count):
+    # Sums rows of values (N, D) per segment id (N,), output shape (count, D).
+    return np.stack([np.bincount(segments, weights=column, minlength=count)
+                     for column in values.T], axis=1)
+
+def match_scans(sources, targets, iterations=30, max_distance=0.5, tolerance=1e-4,
+                min_correspondences=10):
+    '''Aligns every point set in sources to the point set at the same index in targets
+    with ICP. All pairs are solved together: correspondences for the whole batch
+    come from one KD-tree query (each pair lives in its own lane along a third axis
+    so neighbours never come from another pair) and the rigid transforms from one
+    batched SVD. A source point is matched to the closest point on the line through
+    its two nearest target points. Points further than max_distance from their match
+    are ignored. Returns (angles, translations, residuals) of shapes (N,), (N, 2) and
+    (N,), where the transform maps a source point p to R(angle) p + translation and
+    residuals are the RMS distances to the matched target points.'''
+    count = len(sources)
+    lane = 4 * max_distance # Larger than max_distance, so lanes never see each other.
+    target_segments = np.repeat(np.arange(count), [len(target) for target in targets])
+    target_points = np.concatenate(targets, axis=0)
+    tree = cKDTree(np.c_[target_points, target_segments * lane])
+    segments = np.repeat(np.arange(count), [len(source) for source in sources])
+    source_points = np.concatenate(sources, axis=0)
+
+    angles = np.zeros(count)
+    translations = np.zeros((count, 2))
+    residuals = np.full(count, np.inf)
+    active = np.ones(count, dtype=bool) # Pairs that have not converged yet.
+    for _ in range(iterations):
+        selected = active[segments]
+        in_segments = segments[selected]
+        rotations = rotation_matrices(angles)[in_segments]
+        moved = (np.einsum('nij,nj->ni', rotations, source_points[selected])
+                 + translations[in_segments])
+        distances, indices = tree.query(np.c_[moved, in_segments * lane], k=2,
+                                        distance_upper_bound=max_distance)
+        # Match against the closest point on the line through the two nearest target
+        # points, so scans can slide along walls instead of locking on to samples.
+        nearest = target_points[np.minimum(indices[:, 0], len(target_points) - 1)]
+        second = target_points[np.minimum(indices[:, 1], len(target_points) - 1)]
+        direction = second - nearest
+        length = np.einsum('ni,ni->n', direction, direction)
+        along = np.einsum('ni,ni->n', moved - nearest, direction) / np.where(length > 0, length, 1)
+        along[~np.isfinite(distances[:, 1]) | (length == 0)] = 0
+        matched = nearest + along[:, None] * direction
+        distances = np.where(np.isfinite(distances[:, 0]),
+                             np.linalg.norm(moved - matched, axis=1), np.inf)
+        # Reject pairs far worse than the last fit (scan edges, unseen geometry).
+        cutoff = np.minimum(max_distance, 3 * residuals)[in_segments]
+        inliers = distances <= cutoff
+        in_segments = in_segments[inliers]
+        matched = matched[inliers]
+        moved = moved[inliers]
+
+        counts = np.bincount(in_segments, minlength=count)
+        valid = active & (counts >= min_correspondences)
+        safe_counts = np.maximum(counts, 1)[:, None]
+        squared = np.bincount(in_segments, weights=distances[inliers] ** 2, minlength=count)
+        residuals[active] = np.sqrt(squared / safe_counts[:, 0])[active]
+        residuals[active & ~valid] = np.inf
+
+        # Centroids and cross covariances for all pairs at once.
+        moved_mean = _segment_sums(moved, in_segments, count) / safe_counts
+        matched_mean = _segment_sums(matched, in_segments, count) / safe_counts
+        moved_c = moved - moved_mean[in_segments]
+        matched_c = matched - matched_mean[in_segments]
+        products = np.einsum('ni,nj->nij', moved_c, matched_c).reshape(-1, 4)
+        covariances = _segment_sums(products, in_segments, count).reshape(count, 2, 2)
+
+        step_angles = np.where(valid, best_fit_rotations(covariances), 0)
+        step_rotations = rotation_matrices(step_angles)
+        step_translations = matched_mean - np.einsum('nij,nj->ni', step_rotations, moved_mean)
+        step_translations[~valid] = 0
+
+        # Compose the step with the current estimate.
+        angles = angles + step_angles
+        translations = np.einsum('nij,nj->ni', step_rotations, translations) + step_translations
+        step_sizes = np.maximum(np.abs(step_angles), np.abs(step_translations).max(axis=1))
+        active = valid & (step_sizes >= tolerance)
+        if not active.any():
+            break
+    return angles, translations, residuals
+
+def align_sweeps(sweep_dict, iterations=30, max_distance=0.5, tolerance=1e-4):
+    '''Scan-to-scan alignment of a whole flight. Each sweep's lidar_cartesian
+    (without points removed by its mask) is aligned to its predecessor's and the
+    relative corrections are chained along the flight, so the first sweep is the
+    reference. Sweeps lacking drone_position or lidar_cartesian are left out.
+    Output: (sweep_ids, positions, headings, residuals) where positions (N, 2) are
+    the corrected drone positions, headings (N,) the rotation (radians) to apply to
+    each sweep around its drone position, and residuals (N,) the RMS distance (m)
+    to the previous sweep after alignment (0 for the first sweep).'''
+    sweep_ids = [key for key, sweep in sweep_dict.items()
+                 if sweep.lidar_cartesian is not None and sweep.drone_position is not None]
+    sweeps = [sweep_dict[key] for key in sweep_ids]
+    sources = [sweep.masked("lidar_cartesian") for sweep in sweeps[1:]]
+    targets = [sweep.masked("lidar_cartesian") for sweep in sweeps[:-1]]
+    angles, translations, residuals = match_scans(sources, targets, iterations,
+                                                  max_distance, tolerance)
+
+    # Chain relative corrections: C_k = C_(k - 1) * T_k, with C_0 the identity.
+    headings = np.concatenate([[0], np.cumsum(angles)])
+    chained = np.zeros((len(sweeps), 2))
+    for i, rotation in enumerate(rotation_matrices(headings[:-1])):
+        chained[i + 1] = rotation.dot(translations[i]) + chained[i]
+    original = np.array([sweep.drone_position for sweep in sweeps])
+    positions = np.einsum('nij,nj->ni', rotation_matrices(headings), original) + chained
+    return sweep_ids, positions, headings, np.concatenate([[0], residuals])
+
+class SweepAligner():
+    '''
+    Scan-to-scan alignment while flying, one sweep at a time. Each new sweep is
+    aligned to the previous one only and its correction is chained onto the stored
+    correction of the previous sweep, so an update costs the same however long the
+    flight has been. Gives the same corrections as align_sweeps over the sweeps
+    added so far. iterations, max_distance and tolerance are passed to match_scans.
+    '''
+    def __init__(self, iterations=30, max_distance=0.5, tolerance=1e-4):
+        self._iterations = iterations
+        self._max_distance = max_distance
+        self._tolerance = tolerance
+        self._previous = None # Kept points (N, 2) of the last sweep, uncorrected.
+        self._heading = 0.0 # Heading correction of the last sweep.
+        self._chained = np.zeros(2) # Chained translation of the last sweep.
+
+    def add_sweep(self, sweep):
+        '''Aligns sweep (with drone_position and lidar_cartesian) to the last added
+        sweep. Output: (position, heading, residual) as one row of align_sweeps, or
+        None for a sweep lacking drone_position or lidar_cartesian.'''
+        if sweep.lidar_cartesian is None or sweep.drone_position is None:
+            return None
+        points = sweep.masked("lidar_cartesian")
+        if self._previous is None:
+            self._previous = points
+            return sweep.drone_position.astype(float), 0.0, 0.0
+        angles, translations, residuals = match_scans([points], [self._previous], self._iterations,
+                                                      self._max_distance, self._tolerance)
+        # C_k = C_(k - 1) * T_k, as in align_sweeps.
+        self._chained = rotation_matrices(self._heading).dot(translations[0]) + self._chained
+        self._heading += angles[0]
+        self._previous = points
+        position = rotation_matrices(self._heading).dot(sweep.drone_position) + self._chained
+        return position, self._heading, residuals[0]
+
+def apply_corrections(sweep_dict, sweep_ids, positions, headings):
+    '''Moves drone_position and lidar_cartesian of the given sweeps to the poses
+    returned by align_sweeps.'''
+    rotations = rotation_matrices(headings)
+    for key, position, rotation in zip(sweep_ids, positions, rotations):
+        sweep = sweep_dict[key]
+        relative = sweep.lidar_cartesian - sweep.drone_position
+        sweep.lidar_cartesian = relative.dot(rotation.T) + position
+        sweep.drone_position = position.astype(float)
+
+if __name__ == '__main__':
+    flight_path = os.path.join("data", "FlightPath.csv")
+    lidar_path = os.path.join("data", "LIDARPoints.csv")
+
+    sweep_dict = SweepDict(lidar_path, flight_path)
+    runs = 10
+    start = time.perf_counter()
+    for _ in range(runs):
+        sweep_ids, positions, headings, residuals = align_sweeps(sweep_dict)
+    elapsed = (time.perf_counter() - start) / runs
+    print("Aligned %d sweeps in %.1f ms (%.0f sweeps/second)"
+          % (len(sweep_ids), elapsed * 1000, len(sweep_ids) / elapsed))
+    print("Mean residual after alignment: %.3f m" % residuals[1:][np.isfinite(residuals[1:])].mean())
+    shifts = np.linalg.norm(positions - sweep_dict.get_all_drone_positions(), axis=1)
+    print("Largest position correction: %.3f m" % shifts.max())
+
+    # While flying: one update per new sweep instead of solving the whole flight again.
+    update_times = []
+    for _ in range(runs):
+        aligner = SweepAligner()
+        for sweep in sweep_dict.values():
+            start = time.perf_counter()
+            aligner.add_sweep(sweep)
+            update_times.append(time.perf_counter() - start)
+    update = np.mean(update_times)
+    print("Incremental: %.2f ms per new sweep, vs %.1f ms to align the whole flight again"
+          % (update * 1000, elapsed * 1000))
@@ -0,0 +1,133 @@
+# Regular Modules
+import numpy as np
+import time
+import os
+
+# Custom Modules
+from .wall_index import WallIndex
+
+def signed_areas(polygons):
+    # Signed area of each polygon (shoelace), positive for counter clockwise.
+    return np.array([0.5 * np.sum(polygon[:, 0] * np.roll(polygon[:, 1], -1) -
+                                  np.roll(polygon[:, 0], -1) * polygon[:, 1])
+                     for polygon in polygons])
+
+def _point_segment_distances(points, starts, ends):
+    # Distance from each point to the segment between starts and ends, row by row.
+    direction = ends - starts
+    length = np.einsum('ni,ni->n', direction, direction)
+    along = np.einsum('ni,ni->n', points - starts, direction) / np.where(length > 0, length, 1)
+    closest = starts + np.clip(along, 0, 1)[:, None] * direction
+    return np.linalg.norm(points - closest, axis=1)
+
+def douglas_peucker(polygons, max_deviation):
+    '''Douglas-Peucker simplification of closed polygons (list of np.arrays (N, 2)),
+    vectorized over all polygons: every iteration splits all spans of all polygons
+    at once at their furthest vertex, until no vertex is further than max_deviation
+    from the simplified outline. Each polygon keeps at least 3 vertices. Returns the
+    list of kept vertex indices per polygon.'''
+    # Each polygon is closed with a copy of its first vertex, so spans never wrap around.
+    lengths = np.array([len(polygon) for polygon in polygons])
+    starts = np.cumsum(lengths + 1) - (lengths + 1)
+    points = np.concatenate([np.concatenate([polygon, polygon[:1]]) for polygon in polygons])
+    owner = np.repeat(np.arange(len(polygons)), lengths + 1)
+    index = np.arange(len(points))
+    kept = np.zeros(len(points), dtype=bool)
+    kept[starts] = True
+    kept[starts + lengths] = True
+    # Also anchor the vertex furthest from the first one, as the first span is a loop.
+    first_distance = np.linalg.norm(points - points[starts[owner]], axis=1)
+    furthest = np.full(len(polygons), -1.0)
+    np.maximum.at(furthest, owner, first_distance)
+    far = np.nonzero(first_distance == furthest[owner])[0]
+    kept[far[np.unique(owner[far], return_index=True)[1]]] = True
+
+    while True:
+        previous = np.maximum.accumulate(np.where(kept, index, 0))
+        following = np.minimum.accumulate(np.where(kept, index, len(points))[::-1])[::-1]
+        distances = _point_segment_distances(points, points[previous], points[following])
+        distances[kept] = -1
+        span_max = np.full(len(points), -1.0)
+        np.maximum.at(span_max, previous, distances)
+        split = np.nonzero((distances > max_deviation) & (distances == span_max[previous]))[0]
+        if len(split) == 0:
+            break
+        kept[split[np.unique(previous[split], return_index=True)[1]]] = True
+
+    # Make sure no polygon collapses below 3 vertices.
+    kept[starts + lengths] = False
+    counts = np.bincount(owner[kept], minlength=len(polygons))
+    for polygon in np.nonzero(counts < 3)[0]:
+        kept[starts[polygon]:starts[polygon] + lengths[polygon]] = True
+    return [index[starts[i]:starts[i] + lengths[i]][kept[starts[i]:starts[i] + lengths[i]]] - starts[i]
+            for i in range(len(polygons))]
+
+def _crossings(polygons):
+    # Number of proper edge crossings each polygon is part of (itself or with others).
+    edges = np.concatenate([np.concatenate([polygon, np.roll(polygon, -1, axis=0)], axis=1)
+                            for polygon in polygons])
+    owner = np.repeat(np.arange(len(polygons)), [len(polygon) for polygon in polygons])
+    query_ids, wall_ids = WallIndex(edges).intersecting_walls(edges)
+    return np.bincount(owner[query_ids], minlength=len(polygons))
+
+def simplify_polygons(polygons, max_deviation):
+    '''Removes vertices that deviate less than max_deviation from the outline of
+    polygons (list of np.arrays (N, 2), as inside to_real_polygons). A simplified
+    polygon is only used if it keeps the orientation (sign of the area) of the
+    original and adds no edge crossings, either with itself or with the other
+    polygons, otherwise the original polygon is kept.
+    Output: (simplified polygons, number of vertices removed).'''
+    if max_deviation is None or max_deviation <= 0:
+        return polygons, 0
+    kept = douglas_peucker(polygons, max_deviation)
+    simplified = [polygon[keep] for polygon, keep in zip(polygons, kept)]
+
+    # Any change of sign counts, also for thin polygons like the dangling walls from balance_dict.
+    use_original = np.sign(signed_areas(simplified)) != np.sign(signed_areas(polygons))
+    original_crossings = _crossings(polygons)
+    while True:
+        candidate = [polygons[i] if use_original[i] else simplified[i] for i in range(len(polygons))]
+        worse = (_crossings(candidate) > original_crossings) & ~use_original
+        if not worse.any():
+            break
+        use_original |= worse
+    removed = sum(len(polygon) - len(result) for polygon, result in zip(polygons, candidate))
+    return candidate, removed
+
+def densify_walls(walls, pieces, noise=0.0, seed=0):
+    '''Splits every wall (rows of read_mapping_csv) into pieces collinear walls and
+    moves the new inner points at most noise metres in x and y. Imitates walls
+    traced from LIDAR points.'''
+    rng = np.random.default_rng(seed)
+    starts, ends = walls[:, :2], walls[:, 2:]
+    steps = np.arange(pieces + 1) / pieces
+    points = starts[:, None] + steps[None, :, None] * (ends - starts)[:, None]
+    points[:, 1:-1] += rng.uniform(-noise, noise, points[:, 1:-1].shape)
+    return np.concatenate([points[:, :-1], points[:, 1:]], axis=2).reshape(-1, 4)
+
+if __name__ == '__main__':
+    import csv
+    import tempfile
+    from .loader import read_mapping_csv
+    from .path_finder import load_polygons, to_vg_polygons, build_vg_graph
+
+    def timed_build(polygons):
+        start = time.perf_counter()
+        build_vg_graph(to_vg_polygons(polygons), status=False)
+        return time.perf_counter() - start
+
+    walls = read_mapping_csv(os.path.join("data", "FakeMapping.csv"))
+    max_deviation = 0.01
+    with tempfile.TemporaryDirectory() as temp_dir:
+        mapping_path = os.path.join(temp_dir, "DenseMapping.csv")
+        for pieces, noise in ((1, 0.0), (4, 0.0), (4, 0.002), (8, 0.002), (16, 0.002)):
+            with open(mapping_path, 'w', newline='') as csvfile:
+                csv.writer(csvfile).writerows(densify_walls(walls, pieces, noise))
+            original = load_polygons(mapping_path)
+            simplified = load_polygons(mapping_path, max_deviation)
+            before, after = timed_build(original), timed_build(simplified)
+            print("FakeMapping.csv, walls split in %d, noise %.3f m: %d -> %d vertices (%d removed), "
+                  "graph build %.1f ms -> %.1f ms (%.1f ms saved)"
+                  % (pieces, noise, sum(map(len, original)), sum(map(len, simplified)),
+                     sum(map(len, original)) - sum(map(len, simplified)),
+                     before * 1000, after * 1000, (before - after) * 1000))
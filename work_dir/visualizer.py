@@ -4,40 +4,83 @@
 # Regular Modules
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from multiprocessing import Pool
+import subprocess
+import tempfile
+import argparse
+import shutil
+import time
+import csv
 import os
 
 # Custom Modules
 from .loader import SweepDict
 
+# Styling shared by the interactive views and the frame export.
+SWEEP_STYLE = dict(s=1, c='r', marker='.')
+POSITION_STYLE = dict(s=5, c='orange', marker='s')
+PATH_STYLE = dict(c='b', linewidth=1)
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.webm')
+
 class _IndexTracker():
-    def __init__(self, ax, sweep_dict):
+    '''Scroll view over the sweeps. Only the artists that change between sweeps
+    (current sweep, drone position and ID label) are animated. Everything else is
+    kept in a cached background so a scroll step only restores the background and
+    redraws the animated artists (blitting) instead of drawing the whole figure.'''
+    def __init__(self, ax, sweep_dict, limits):
         self._ax = ax[0]
         self._ax.set_title('Use scroll wheel to scroll through sweeps.')
+        self._canvas = self._ax.figure.canvas
 
         self._sweep_dict = sweep_dict
         self._frames = len(sweep_dict.keys())
         self._ind = 0
 
-        all_drone_positions = sweep_dict.get_all_drone_positions()
-        all_cartesian_points = sweep_dict.get_all_lidar_cartesian()
-        # Initializing with all points to get the right scale
-        self._points = self._ax.scatter(all_cartesian_points[:, 0],
-                                      all_cartesian_points[:, 1],
-                                      s=1, c='r', marker='.')
-        self._positions = self._ax.scatter(all_drone_positions[:, 0],
-                                         all_drone_positions[:, 1],
-                                         s=5, c='orange', marker='s')
+        # Global limits are set up front, sweeps are fetched one at a time on demand.
+        x_limits, y_limits = limits
+        self._ax.set_xlim(*x_limits)
+        self._ax.set_ylim(*y_limits)
+        self._points = self._ax.scatter([], [], animated=True, **SWEEP_STYLE)
+        self._positions = self._ax.scatter([], [], animated=True, **POSITION_STYLE)
+        # A text artist of its own, the y axis label is drawn with the axis and would end up in the background.
+        self._label = self._ax.text(0.02, 0.98, '', transform=self._ax.transAxes, va='top', animated=True)
+        self._background = None
+        self._canvas.mpl_connect('draw_event', self._on_draw)
         self._update()
 
+    def _animated_artists(self):
+        return [self._points, self._positions, self._label]
+
+    def _on_draw(self, event):
+        # A full draw happened (first show, resize, zoom): cache the new background.
+        figure = self._ax.figure
+        self._background = self._canvas.copy_from_bbox(figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        figure = self._ax.figure
+        for artist in self._animated_artists():
+            figure.draw_artist(artist)
+
     def _update(self):
-        cartesian_points = self._sweep_dict[self._ind].lidar_cartesian
-        drone_posision = self._sweep_dict[self._ind].drone_position
+        sweep = self._sweep_dict[self._ind]
+        cartesian_points = sweep.masked("lidar_cartesian")
+        drone_posision = sweep.drone_position
         # Update drone position and the corresposinding sweep
-        self._points.set_offsets(np.c_[cartesian_points[:, 0], cartesian_points[:, 1]])
-        self._positions.set_offsets(np.c_[drone_posision[0], drone_posision[1]])
+        self._points.set_offsets(cartesian_points)
+        self._positions.set_offsets(drone_posision.reshape(1, 2))
         # Update label with to new sweep ID
-        self._ax.set_ylabel('ID: %s' % self._ind)
-        self._points.axes.figure.canvas.draw()
+        self._label.set_text('ID: %s' % self._ind)
+        if self._background is None:
+            # Nothing cached yet, the draw_event will take care of the rest.
+            self._canvas.draw_idle()
+            return
+        self._canvas.restore_region(self._background)
+        self._draw_animated()
+        self._canvas.blit(self._ax.figure.bbox)
+        self._canvas.flush_events()
 
     def onscroll(self, event):
         # print("%s %s" % (event.button, event.step))
@@ -47,29 +90,231 @@ class _IndexTracker():
             else:
                 self._ind = (self._ind - 1) % self._frames
             self._update()
-    
+
     def onpick(self, event):
         ind = event.ind[0]
         self._ind = ind
         self._update()
 
+class _OverviewPanel():
+    '''Overview of all sweeps in one. Small flights are scattered point by point.
+    Larger flights are shown as a 2D density raster that is recomputed for the
+    visible region every time the view limits change (zoom/pan), so the level of
+    detail follows the zoom level and the cost does not depend on the number of
+    points drawn. sweep_points is a list of np.arrays (N, 2), one per sweep, and
+    is only concatenated for small flights.'''
+    def __init__(self, ax, sweep_points, max_points=200000, resolution=512):
+        self._ax = ax
+        self._points = sweep_points
+        self._resolution = resolution
+        self._image = None
+        self._view = None
+        if sum(len(points) for points in sweep_points) <= max_points:
+            all_cartesian_points = np.concatenate(sweep_points) if sweep_points else np.empty((0, 2))
+            self._ax.scatter(all_cartesian_points[:, 0], all_cartesian_points[:, 1], **SWEEP_STYLE)
+            return
+        cmap = plt.get_cmap('Reds').copy()
+        cmap.set_bad('white')
+        self._image = self._ax.imshow(np.zeros((1, 1)), origin='lower', cmap=cmap,
+                                      aspect='auto', interpolation='nearest', zorder=0)
+        self._ax.callbacks.connect('xlim_changed', self._on_limits_changed)
+        self._ax.callbacks.connect('ylim_changed', self._on_limits_changed)
+
+    def set_limits(self, limits):
+        x_limits, y_limits = limits
+        self._ax.set_xlim(*x_limits)
+        self._ax.set_ylim(*y_limits)
+        self._on_limits_changed(self._ax)
+
+    def _on_limits_changed(self, ax):
+        if self._image is None:
+            return
+        view = (tuple(ax.get_xlim()), tuple(ax.get_ylim()))
+        if view == self._view:
+            return
+        self._view = view
+        raster = density_raster(self._points, *view, shape=(self._resolution, self._resolution))
+        raster = np.ma.masked_equal(np.log1p(raster), 0)
+        self._image.set_data(raster)
+        self._image.set_extent((*view[0], *view[1]))
+        self._image.set_clim(0, max(raster.max(), 1))
+
+def density_raster(points, x_limits, y_limits, shape=(512, 512)):
+    '''Counts points of shape (N, 2) falling in each cell of a raster of the given shape
+    spanning x_limits and y_limits. points can also be a list of such arrays (one per
+    sweep), which are counted one at a time instead of being concatenated.
+    Returns array of shape (rows, cols) with row 0 at the smallest y value (imshow
+    with origin='lower').'''
+    rows, cols = shape
+    (x_min, x_max), (y_min, y_max) = sorted(x_limits), sorted(y_limits)
+    counts = np.zeros(rows * cols, dtype=np.intp)
+    for chunk in ([points] if isinstance(points, np.ndarray) else points):
+        inside = ((chunk[:, 0] >= x_min) & (chunk[:, 0] < x_max) &
+                  (chunk[:, 1] >= y_min) & (chunk[:, 1] < y_max))
+        visible = chunk[inside]
+        if not len(visible):
+            continue
+        col = ((visible[:, 0] - x_min) * (cols / (x_max - x_min))).astype(np.intp)
+        row = ((visible[:, 1] - y_min) * (rows / (y_max - y_min))).astype(np.intp)
+        np.clip(col, 0, cols - 1, out=col)
+        np.clip(row, 0, rows - 1, out=row)
+        # Only as long as the largest cell index, not a full raster per sweep.
+        binned = np.bincount(row * cols + col)
+        counts[:len(binned)] += binned
+    return counts.reshape(rows, cols)
+
+def get_axis_limits(sweep_dict, margin=0.05):
+    '''Returns ((x_min, x_max), (y_min, y_max)) covering all LIDAR points and drone
+    positions in sweep_dict, padded by margin (fraction of the span). Done sweep by
+    sweep so the whole flight never has to be concatenated.'''
+    mins, maxs = [], []
+    for sweep in sweep_dict.values():
+        for points in (sweep.masked("lidar_cartesian"), sweep.drone_position):
+            if points is not None and points.size:
+                points = points.reshape(-1, 2)
+                mins.append(points.min(axis=0))
+                maxs.append(points.max(axis=0))
+    low = np.min(mins, axis=0)
+    high = np.max(maxs, axis=0)
+    pad = (high - low) * margin
+    low, high = low - pad, high + pad
+    return (low[0], high[0]), (low[1], high[1])
+
 def display_drone_data(sweep_dict):
     fig, ax = plt.subplots(1, 2, figsize=(11, 5))
-    tracker = _IndexTracker(ax, sweep_dict)
+    limits = get_axis_limits(sweep_dict)
+    tracker = _IndexTracker(ax, sweep_dict, limits)
     fig.canvas.mpl_connect('scroll_event', tracker.onscroll)
     fig.canvas.mpl_connect('pick_event', tracker.onpick)
     # Get all drone positions and cartesian points
     all_drone_positions = sweep_dict.get_all_drone_positions()
-    all_cartesian_points = sweep_dict.get_all_lidar_cartesian()
+    sweep_points = [sweep.masked("lidar_cartesian") for sweep in sweep_dict.values()
+                    if sweep.lidar_cartesian is not None]
     # Draw a second view showing all sweeps in one
-    ax[1].scatter(all_cartesian_points[:, 0], all_cartesian_points[:, 1], s=1, c='r', marker='.')
-    ax[1].scatter(all_drone_positions[:, 0], all_drone_positions[:, 1], s=5, c='orange', marker='s', picker=True)
+    overview = _OverviewPanel(ax[1], sweep_points)
+    ax[1].scatter(all_drone_positions[:, 0], all_drone_positions[:, 1], picker=True, **POSITION_STYLE)
+    overview.set_limits(limits)
     ax[1].set_title('Click on the drone points (yellow)\nto see the sweep of that position.')
     plt.show()
 
+# State of each export worker process, set once by _init_export_worker.
+_export_frame = None
+
+def _init_export_worker(limits, planned_path, figsize, dpi):
+    # Build one figure per worker process and reuse it for every frame it renders.
+    global _export_frame
+    figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(1, 1, 1)
+    x_limits, y_limits = limits
+    ax.set_xlim(*x_limits)
+    ax.set_ylim(*y_limits)
+    ax.set_title('Sweeps of the flight.')
+    if planned_path is not None:
+        ax.plot(planned_path[:, 0], planned_path[:, 1], **PATH_STYLE)
+    points = ax.scatter([], [], **SWEEP_STYLE)
+    positions = ax.scatter([], [], **POSITION_STYLE)
+    _export_frame = (figure, ax, points, positions)
+
+def _render_frame(job):
+    # Render one sweep to frame_path. Runs inside an export worker process.
+    frame_path, sweep_id, cartesian_points, drone_position = job
+    figure, ax, points, positions = _export_frame
+    points.set_offsets(cartesian_points)
+    positions.set_offsets(drone_position.reshape(1, 2))
+    ax.set_ylabel('ID: %s' % sweep_id)
+    figure.savefig(frame_path)
+    return frame_path
+
+def export_sweep_frames(sweep_dict, output_path, planned_path=None, processes=None,
+                        figsize=(5.5, 5), dpi=100, fps=10):
+    '''Headless version of the scroll view in display_drone_data: renders one frame per
+    sweep, optionally with planned_path (np.array of shape (N, 2)) drawn on top.
+    Frames are rendered across a pool of processes (default: one per core) that
+    all use the same global axis limits. If output_path ends with a video extension
+    the frames are encoded with ffmpeg, otherwise output_path is a directory the
+    PNG frames are written to. Returns the list of frame paths or the video path.'''
+    is_video = output_path.lower().endswith(VIDEO_EXTENSIONS)
+    if is_video and shutil.which('ffmpeg') is None:
+        raise RuntimeError("ffmpeg is required to export sweeps to video")
+    if planned_path is not None:
+        planned_path = np.asarray(planned_path, dtype=float).reshape(-1, 2)
+    if not is_video:
+        os.makedirs(output_path, exist_ok=True)
+        return _render_frames(sweep_dict, output_path, planned_path, processes, figsize, dpi)
+
+    # The frames only live until they are encoded, also when rendering or encoding fails.
+    with tempfile.TemporaryDirectory() as frame_dir:
+        _render_frames(sweep_dict, frame_dir, planned_path, processes, figsize, dpi)
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-framerate', str(fps),
+                        '-i', os.path.join(frame_dir, 'frame_%05d.png'),
+                        '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p',
+                        output_path], check=True)
+    return output_path
+
+def _render_frames(sweep_dict, frame_dir, planned_path, processes, figsize, dpi):
+    # Renders the frames of export_sweep_frames into frame_dir, returns their paths in sweep order.
+    jobs = []
+    for sweep_id, sweep in sweep_dict.items():
+        if sweep.lidar_cartesian is None or sweep.drone_position is None:
+            continue
+        frame_path = os.path.join(frame_dir, 'frame_%05d.png' % len(jobs))
+        jobs.append((frame_path, sweep_id, sweep.masked("lidar_cartesian"), sweep.drone_position))
+
+    processes = processes or os.cpu_count()
+    chunksize = max(1, len(jobs) // (4 * processes))
+    initargs = (get_axis_limits(sweep_dict), planned_path, figsize, dpi)
+    with Pool(processes, initializer=_init_export_worker, initargs=initargs) as pool:
+        return list(pool.imap(_render_frame, jobs, chunksize=chunksize))
+
+def read_path_csv(file_path):
+    '''Reads a path stored by path_finder.store_path (a "id, 1" row before every
+    point, as in FlightPath.csv). Output: np.array of shape (N, 2) in stored order.'''
+    with open(file_path) as csv_data_file:
+        reader = [row for row in csv.reader(csv_data_file) if row]
+    points = []
+    index = 0
+    while index < len(reader):
+        _, data_size = [int(value) for value in reader[index]]
+        points.extend(reader[index + 1: index + 1 + data_size])
+        index += 1 + data_size
+    return np.array(points, dtype=float).reshape(-1, 2)
+
+def benchmark_export(sweep_dict, planned_path=None, process_counts=None):
+    # Times export_sweep_frames to a temporary directory for each number of processes.
+    process_counts = process_counts or sorted({1, 2, 4, os.cpu_count()})
+    frames = sum(sweep.lidar_cartesian is not None and sweep.drone_position is not None
+                 for sweep in sweep_dict.values())
+    single = None
+    for processes in process_counts:
+        with tempfile.TemporaryDirectory() as frame_dir:
+            start = time.perf_counter()
+            export_sweep_frames(sweep_dict, frame_dir, planned_path, processes=processes)
+            elapsed = time.perf_counter() - start
+        single = single or elapsed
+        print("%d processes: %d frames in %.2f s (%.1f frames/s, %.2fx one process)"
+              % (processes, frames, elapsed, frames / elapsed, single / elapsed))
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="View or export the sweeps of a flight.")
+    parser.add_argument('--export', metavar='OUTPUT',
+                        help="Render every sweep to a directory of PNG frames or a video file instead of opening the viewer.")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="Number of processes used to render frames (default: one per core).")
+    parser.add_argument('--path', metavar='PATH_CSV',
+                        help="Draw a planned path stored by path_finder.store_path on top of the exported frames.")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Time the frame export with 1, 2, 4 and one process per core instead.")
+    args = parser.parse_args()
+
     flight_path = os.path.join("data", "FlightPath.csv")
     lidar_path = os.path.join("data", "LIDARPoints.csv")
 
     sweep_dict = SweepDict(lidar_path, flight_path)
-    display_drone_data(sweep_dict)
\ No newline at end of file
+    planned_path = read_path_csv(args.path) if args.path else None
+    if args.benchmark:
+        benchmark_export(sweep_dict, planned_path)
+    elif args.export:
+        export_sweep_frames(sweep_dict, args.export, planned_path, processes=args.processes)
+    else:
+        display_drone_data(sweep_dict)
@@ -0,0 +1,157 @@
+# Regular Modules
+import numpy as np
+from scipy.spatial import cKDTree
+import time
+import os
+
+# Custom Modules
+from .loader import SweepDict
+
+class VoxelGrid():
+    '''
+    Bins 2D points into square cells of side voxel_size and keeps one entry per
+    occupied cell: the centroid of its points, the number of points and the first
+    and last sweep that hit it. Cells are identified by a 64 bit key packing the
+    two cell indices and kept sorted, so adding points is a vectorized
+    sort/unique/searchsorted merge. Points can be added sweep by sweep as they
+    arrive or for a whole flight at once.
+    '''
+    _OFFSET = 2 ** 30 # Cell indices must lie in [-2^30, 2^30) to fit the key.
+
+    def __init__(self, voxel_size=0.05):
+        assert voxel_size > 0, "Expected voxel_size to be positive"
+        self._voxel_size = voxel_size
+        self._keys = np.empty(0, dtype=np.int64)
+        self._sums = np.empty((0, 2))
+        self._counts = np.empty(0, dtype=np.int64)
+        self._first_sweeps = np.empty(0, dtype=np.int64)
+        self._last_sweeps = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return "VoxelGrid(voxel_size: %s| cells: %d| points: %d)" % (
+            self._voxel_size, len(self), self._counts.sum())
+
+    @property
+    def voxel_size(self):
+        return self._voxel_size
+
+    @property
+    def centroids(self):
+        # Representative point (mean of its points) of each cell, shape (M, 2).
+        return self._sums / self._counts[:, None]
+
+    @property
+    def counts(self):
+        return self._counts
+
+    @property
+    def first_sweeps(self):
+        return self._first_sweeps
+
+    @property
+    def last_sweeps(self):
+        return self._last_sweeps
+
+    @property
+    def cells(self):
+        # Integer cell indices (ix, iy) of each cell, shape (M, 2).
+        ix = (self._keys >> 32) - self._OFFSET
+        iy = (self._keys & 0xFFFFFFFF) - self._OFFSET
+        return np.stack([ix, iy], axis=1)
+
+    def cell_keys(self, points):
+        # Packs the cell indices of points (N, 2) into one int64 key per point.
+        cells = np.floor(points / self._voxel_size).astype(np.int64) + self._OFFSET
+        return (cells[:, 0] << 32) | cells[:, 1]
+
+    def add(self, points, sweep_ids=0):
+        '''Adds points of shape (N, 2). sweep_ids is the sweep the points came from,
+        either one id for all points or an array of shape (N,).'''
+        if len(points) == 0:
+            return
+        sweep_ids = np.broadcast_to(np.asarray(sweep_ids, dtype=np.int64), (len(points),))
+        keys, inverse = np.unique(self.cell_keys(points), return_inverse=True)
+        sums = np.stack([np.bincount(inverse, weights=points[:, 0], minlength=len(keys)),
+                         np.bincount(inverse, weights=points[:, 1], minlength=len(keys))], axis=1)
+        counts = np.bincount(inverse, minlength=len(keys))
+        first_sweeps = np.full(len(keys), np.iinfo(np.int64).max)
+        np.minimum.at(first_sweeps, inverse, sweep_ids)
+        last_sweeps = np.full(len(keys), np.iinfo(np.int64).min)
+        np.maximum.at(last_sweeps, inverse, sweep_ids)
+
+        # Merge into the existing (sorted) cells.
+        index = np.searchsorted(self._keys, keys)
+        exists = index < len(self._keys)
+        exists[exists] = self._keys[index[exists]] == keys[exists]
+        old = index[exists]
+        self._sums[old] += sums[exists]
+        self._counts[old] += counts[exists]
+        self._first_sweeps[old] = np.minimum(self._first_sweeps[old], first_sweeps[exists])
+        self._last_sweeps[old] = np.maximum(self._last_sweeps[old], last_sweeps[exists])
+        new = ~exists
+        insert_at = index[new]
+        self._keys = np.insert(self._keys, insert_at, keys[new])
+        self._sums = np.insert(self._sums, insert_at, sums[new], axis=0)
+        self._counts = np.insert(self._counts, insert_at, counts[new])
+        self._first_sweeps = np.insert(self._first_sweeps, insert_at, first_sweeps[new])
+        self._last_sweeps = np.insert(self._last_sweeps, insert_at, last_sweeps[new])
+
+    def add_sweep_dict(self, sweep_dict):
+        # Adds lidar_cartesian of every sweep in sweep_dict in one batch, without points removed by masks.
+        keys = [key for key, sweep in sweep_dict.items() if sweep.lidar_cartesian is not None]
+        if not keys:
+            return
+        points = [sweep_dict[key].masked("lidar_cartesian") for key in keys]
+        sweep_ids = np.repeat(np.array(keys, dtype=np.int64), [len(p) for p in points])
+        self.add(np.concatenate(points, axis=0), sweep_ids)
+
+def voxel_downsample(points, voxel_size=0.05):
+    '''Downsamples points of shape (N, 2) to one centroid per occupied cell.
+    Returns (centroids, counts).'''
+    grid = VoxelGrid(voxel_size)
+    grid.add(points)
+    return grid.centroids, grid.counts
+
+def _time(function, runs=5):
+    # Average time in seconds of calling function.
+    start = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return (time.perf_counter() - start) / runs
+
+def _downstream(points):
+    # Stand-in for downstream consumers: spatial indexing plus neighbour queries.
+    tree = cKDTree(points)
+    tree.query_ball_point(points[::10], r=0.2, return_length=True)
+
+if __name__ == '__main__':
+    flight_path = os.path.join("data", "FlightPath.csv")
+    lidar_path = os.path.join("data", "LIDARPoints.csv")
+
+    sweep_dict = SweepDict(lidar_path, flight_path)
+    all_points = sweep_dict.get_all_lidar_cartesian()
+    # A larger flight: the sample flight repeated with sensor noise.
+    noise = np.random.default_rng(0).normal(scale=0.01, size=(50,) + all_points.shape)
+    large_points = (all_points + noise).reshape(-1, 2)
+
+    for name, points in (("sample flight", all_points), ("50x sample flight", large_points)):
+        for voxel_size in (0.02, 0.05, 0.1):
+            grid = VoxelGrid(voxel_size)
+            build = _time(lambda: VoxelGrid(voxel_size).add(points), runs=3)
+            grid.add(points)
+            centroids = grid.centroids
+            before = _time(lambda: _downstream(points), runs=3)
+            after = _time(lambda: _downstream(centroids), runs=3)
+            print("%s, voxel %.2f m: %d -> %d points (%.1fx reduction), grid built in %.1f ms, "
+                  "downstream %.1f ms -> %.1f ms (%.1fx speedup)"
+                  % (name, voxel_size, len(points), len(grid), len(points) / len(grid),
+                     build * 1000, before * 1000, after * 1000, before / after))
+
+    # Incremental use: one sweep at a time, as sweeps arrive.
+    grid = VoxelGrid(0.05)
+    elapsed = _time(lambda: [grid.add(sweep.masked("lidar_cartesian"), key) for key, sweep in sweep_dict.items()], runs=1)
+    print("Incremental: %d sweeps added in %.1f ms (%.0f sweeps/second)"
+          % (len(sweep_dict), elapsed * 1000, len(sweep_dict) / elapsed))
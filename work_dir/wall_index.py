@@ -0,0 +1,202 @@
+# Regular Modules
+import numpy as np
+import time
+import os
+
+# Custom Modules
+from .loader import read_mapping_csv
+
+def to_segments(segments):
+    # Converts segments given as (N, 4) or (N, 2, 2) to np.array of shape (N, 4).
+    return np.asarray(segments, dtype=float).reshape(-1, 4)
+
+def _expand(counts):
+    '''For counts (N,) returns (owner, local) where owner repeats i counts[i]
+    times and local counts 0..counts[i] - 1 for each i.'''
+    owner = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    local = np.arange(len(owner)) - starts[owner]
+    return owner, local
+
+def _orientation(a, b, c, tolerance):
+    # Sign (-1, 0, 1) of the cross product (b - a) x (c - a) for rows of points.
+    cross = ((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) -
+             (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+    return np.where(cross > tolerance, 1, np.where(cross < -tolerance, -1, 0))
+
+def segments_intersect(first, second, touching=False, tolerance=1e-9):
+    '''Row by row intersection test of segments first (N, 4) and second (N, 4).
+    With touching=False only proper crossings count, so segments sharing an end
+    point, ending on each other or overlapping along a line do not intersect.
+    With touching=True any common point counts. Returns bool np.array (N,).'''
+    p1, p2 = first[:, :2], first[:, 2:]
+    q1, q2 = second[:, :2], second[:, 2:]
+    o1 = _orientation(p1, p2, q1, tolerance)
+    o2 = _orientation(p1, p2, q2, tolerance)
+    o3 = _orientation(q1, q2, p1, tolerance)
+    o4 = _orientation(q1, q2, p2, tolerance)
+    if not touching:
+        return (o1 * o2 < 0) & (o3 * o4 < 0)
+    # Bounding boxes must overlap, this decides the case where all four are collinear.
+    overlap = ((np.minimum(p1, p2) <= np.maximum(q1, q2) + tolerance) &
+               (np.minimum(q1, q2) <= np.maximum(p1, p2) + tolerance)).all(axis=1)
+    return (o1 * o2 <= 0) & (o3 * o4 <= 0) & overlap
+
+class WallIndex():
+    '''
+    Uniform grid (spatial hash) over wall segments, for example the rows of
+    read_mapping_csv(). Each wall is listed in every cell it passes through, stored
+    as one flat array with per cell offsets. A batch of query segments is walked
+    through the grid column by column, so only walls sharing a cell with a query are
+    tested, and the exact segment tests for the whole batch are done at once.
+    '''
+    def __init__(self, walls, cell_size=None):
+        self._walls = to_segments(walls)
+        points = self._walls.reshape(-1, 2)
+        self._origin = points.min(axis=0)
+        extent = np.maximum(points.max(axis=0) - self._origin, 1e-9)
+        if cell_size is None:
+            # Aim for about one wall per cell.
+            cell_size = max(np.sqrt(extent.prod() / len(self._walls)), extent.max() / 1024)
+        self._cell_size = cell_size
+        self._shape = np.floor(extent / cell_size).astype(int) + 1
+
+        wall_ids, cells = self._segment_cells(self._walls)
+        order = np.argsort(cells, kind='stable')
+        self._cell_walls = wall_ids[order]
+        counts = np.bincount(cells, minlength=self._shape.prod())
+        self._cell_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self):
+        return len(self._walls)
+
+    @property
+    def walls(self):
+        return self._walls
+
+    @property
+    def cell_size(self):
+        return self._cell_size
+
+    def _segment_cells(self, segments):
+        '''Returns (segment_ids, flat cell ids) of every grid cell each segment
+        passes through, column by column (parts outside the grid are dropped).'''
+        size = self._cell_size
+        nx, ny = self._shape
+        start = (segments[:, :2] - self._origin) / size
+        end = (segments[:, 2:] - self._origin) / size
+        low = np.minimum(start, end)
+        high = np.maximum(start, end)
+        inside = (high[:, 0] >= 0) & (low[:, 0] < nx) & (high[:, 1] >= 0) & (low[:, 1] < ny)
+        ids = np.nonzero(inside)[0]
+        start, end, low, high = start[ids], end[ids], low[ids], high[ids]
+
+        # One entry per (segment, column) the segment covers.
+        first_col = np.clip(np.floor(low[:, 0]), 0, nx - 1).astype(int)
+        last_col = np.clip(np.floor(high[:, 0]), 0, nx - 1).astype(int)
+        owner, local = _expand(last_col - first_col + 1)
+        col = first_col[owner] + local
+        # y range of the segment within the column.
+        xa = np.maximum(col, low[owner, 0])
+        xb = np.minimum(col + 1, high[owner, 0])
+        dx = end[owner, 0] - start[owner, 0]
+        dy = end[owner, 1] - start[owner, 1]
+        vertical = np.abs(dx) < 1e-12
+        slope = np.where(vertical, 0, dy / np.where(vertical, 1, dx))
+        ya = start[owner, 1] + (xa - start[owner, 0]) * slope
+        yb = start[owner, 1] + (xb - start[owner, 0]) * slope
+        y_low = np.where(vertical, low[owner, 1], np.minimum(ya, yb))
+        y_high = np.where(vertical, high[owner, 1], np.maximum(ya, yb))
+        eps = 1e-9 # Be generous at cell borders.
+        first_row = np.clip(np.floor(y_low - eps), 0, ny - 1).astype(int)
+        last_row = np.clip(np.floor(y_high + eps), 0, ny - 1).astype(int)
+
+        # One entry per (segment, cell).
+        column_owner, local = _expand(last_row - first_row + 1)
+        row = first_row[column_owner] + local
+        cells = col[column_owner] * ny + row
+        return ids[owner[column_owner]], cells
+
+    def candidates(self, segments):
+        '''Returns unique (query_ids, wall_ids) pairs of query segments (M, 4) and
+        walls sharing at least one grid cell.'''
+        segments = to_segments(segments)
+        query_ids, cells = self._segment_cells(segments)
+        counts = self._cell_offsets[cells + 1] - self._cell_offsets[cells]
+        owner, local = _expand(counts)
+        wall_ids = self._cell_walls[self._cell_offsets[cells[owner]] + local]
+        query_ids = query_ids[owner]
+        pairs = np.unique(query_ids.astype(np.int64) * len(self._walls) + wall_ids)
+        return pairs // len(self._walls), pairs % len(self._walls)
+
+    def intersecting_walls(self, segments, touching=False):
+        '''Returns (query_ids, wall_ids) of every query segment (M, 4) crossing a
+        wall, sorted by query id and then wall id. See segments_intersect for touching.'''
+        segments = to_segments(segments)
+        query_ids, wall_ids = self.candidates(segments)
+        hits = segments_intersect(segments[query_ids], self._walls[wall_ids], touching)
+        return query_ids[hits], wall_ids[hits]
+
+    def intersects(self, segments, touching=False):
+        # Returns bool np.array (M,) telling whether each query segment crosses a wall.
+        segments = to_segments(segments)
+        query_ids, _ = self.intersecting_walls(segments, touching)
+        return np.bincount(query_ids, minlength=len(segments)) > 0
+
+    def line_of_sight(self, origins, targets, touching=False):
+        # Returns bool np.array (M,), True where origins[i] (M, 2) sees targets[i] (M, 2).
+        origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+        targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+        return ~self.intersects(np.concatenate([origins, targets], axis=1), touching)
+
+def path_to_array(path):
+    # Converts a path of vg.Points (as from get_vg_shortest_path) or coordinates to np.array (N, 2).
+    if len(path) and hasattr(path[0], 'x'):
+        return np.array([[point.x, point.y] for point in path], dtype=float)
+    return np.asarray(path, dtype=float).reshape(-1, 2)
+
+def validate_path(path, wall_index, touching=False):
+    '''Checks every leg of path (vg.Points or np.array (N, 2)) against wall_index.
+    Returns None if the path is valid, otherwise (leg, wall): the index of the first
+    leg crossing a wall (leg i goes from path[i] to path[i + 1]) and the index of
+    the wall it crosses.'''
+    points = path_to_array(path)
+    legs = np.concatenate([points[:-1], points[1:]], axis=1)
+    leg_ids, wall_ids = wall_index.intersecting_walls(legs, touching)
+    if len(leg_ids) == 0:
+        return None
+    return int(leg_ids[0]), int(wall_ids[0])
+
+def _random_walls(count, extent, rng):
+    # Short random walls spread over a square of side extent.
+    starts = rng.random((count, 2)) * extent
+    angles = rng.random(count) * 2 * np.pi
+    lengths = rng.random(count) * 2 + 0.5
+    ends = starts + lengths[:, None] * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    return np.concatenate([starts, ends], axis=1)
+
+if __name__ == '__main__':
+    mapping_path = os.path.join("data", "FakeMapping.csv")
+    wall_index = WallIndex(read_mapping_csv(mapping_path))
+    print("FakeMapping.csv: %d walls, cell size %.2f m" % (len(wall_index), wall_index.cell_size))
+
+    rng = np.random.default_rng(0)
+    query_count = 10000
+    for count in (1000, 10000, 100000):
+        # Keep wall density constant so the map grows with the number of walls.
+        extent = np.sqrt(count) * 5
+        walls = _random_walls(count, extent, rng)
+        start = time.perf_counter()
+        wall_index = WallIndex(walls)
+        build = time.perf_counter() - start
+        origins = rng.random((query_count, 2)) * extent
+        queries = np.concatenate([origins, origins + rng.normal(scale=3, size=(query_count, 2))], axis=1)
+        start = time.perf_counter()
+        hits = wall_index.intersects(queries)
+        query = time.perf_counter() - start
+        print("%d walls: built in %.1f ms, %d segment queries in %.1f ms (%.2f us/query, %.0f%% blocked)"
+              % (count, build * 1000, query_count, query * 1000, query / query_count * 1e6, hits.mean() * 100))
+        if count == 1000:
+            start = time.perf_counter()
+            brute = np.array([segments_intersect(np.repeat(q[None], count, axis=0), walls).any() for q in queries])
+            print("    brute force: %.1f ms, same result: %s" % ((time.perf_counter() - start) * 1000, (brute == hits).all()))